@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 from __future__ import annotations
 
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -31,6 +32,31 @@ SECRET_KEY: str = os.environ.get('SECRET_KEY')
 
 # Chave de API para o Scanner
 SCANNER_API_KEY = os.environ.get('SCANNER_API_KEY')
+# URL base da API do Scanner usada pelos comandos run_scanner/run_pricing
+SCANNER_API_BASE_URL = os.environ.get('SCANNER_API_BASE_URL', 'https://cstrack.online/scanner/api')
+# Parada antecipada dos feeds ordenados por desconto (vazio = desativado).
+# Desconto mínimo (%) informado pelo marketplace e razão mínima preço Buff / preço da oferta.
+SCANNER_MIN_DISCOUNT = float(os.environ['SCANNER_MIN_DISCOUNT']) if os.environ.get('SCANNER_MIN_DISCOUNT') else None
+SCANNER_MIN_REFERENCE_RATIO = float(os.environ['SCANNER_MIN_REFERENCE_RATIO']) if os.environ.get('SCANNER_MIN_REFERENCE_RATIO') else None
+# Perfis de varredura do run_scanner: faixa de preço (BRL), limite de itens por faixa e em quantas
+# faixas (bandas) a faixa é dividida para ser buscada em paralelo. Pode ser sobrescrito com um JSON
+# na variável de ambiente SCANNER_SCAN_PROFILES.
+SCANNER_SCAN_PROFILES: list[dict] = json.loads(os.environ['SCANNER_SCAN_PROFILES']) if os.environ.get('SCANNER_SCAN_PROFILES') else [
+    {'source': 'dash_p2p', 'min_price': 25, 'max_price': 500, 'limit': 20, 'bands': 1},
+    {'source': 'dash_bot', 'min_price': 25, 'max_price': 300, 'limit': 80, 'bands': 1},
+    {'source': 'brskins', 'min_price': 25, 'max_price': 350, 'limit': 80, 'bands': 1},
+]
+# Orçamento compartilhado de requisições ao Buff (web, scheduler e workers): taxa em req/s
+# e tamanho máximo da rajada. Usado apenas na criação do registro; depois é editável no admin.
+SCANNER_BUFF_RATE = float(os.environ.get('SCANNER_BUFF_RATE', '3'))
+SCANNER_BUFF_BURST = float(os.environ.get('SCANNER_BUFF_BURST', '10'))
+# Espera máxima (s) do long-poll de get-item-batch (?wait=); precisa ficar abaixo dos timeouts do Gunicorn e do nginx
+SCANNER_LONG_POLL_MAX = float(os.environ.get('SCANNER_LONG_POLL_MAX', '25'))
+# Retenção (dias) do histórico de preços do Buff: as linhas brutas de ScannedItem e os agregados
+# por hora mais antigos que isso são apagados pelo rollup_prices (os agregados diários ficam para sempre).
+# As linhas brutas precisam cobrir a janela de volatilidade do rescore_pricing (7 dias).
+SCANNER_RAW_RETENTION_DAYS = int(os.environ.get('SCANNER_RAW_RETENTION_DAYS', '14'))
+SCANNER_HOURLY_RETENTION_DAYS = int(os.environ.get('SCANNER_HOURLY_RETENTION_DAYS', '180'))
 
 # ATENÇÃO: DEBUG deve ser False em produção!
 DEBUG: bool = os.environ.get('DEBUG', 'False').lower() == 'true'
@@ -59,11 +59,15 @@ urlpatterns = [
     
     # Endpoints da API do Scanner
     path("scanner/api/add-items/", scanner_views.scanner_api_add_items, name="scanner_api_add_items"),
+    path("scanner/api/ingest-listings/", scanner_views.scanner_api_ingest_listings, name="scanner_api_ingest_listings"),
     path("scanner/api/items-to-update/", scanner_views.get_items_to_update, name="scanner_api_get_items_to_update"),
+    path("scanner/api/reference-prices/", scanner_views.get_reference_prices, name="scanner_api_reference_prices"),
     path("scanner/api/update-buff-prices/", scanner_views.update_buff_prices, name="scanner_api_update_buff_prices"),
+    path("scanner/api/rate-budget/", scanner_views.acquire_rate_budget, name="scanner_api_rate_budget"),
     path("scanner/api/calculate-differences/", scanner_views.calculate_differences, name="scanner_api_calculate_differences"),
     path("scanner/api/items-to-price/", scanner_views.get_items_to_price, name="scanner_api_get_items_to_price"),
     path("scanner/api/get-item-batch/", scanner_views.get_items_for_pricing, name="scanner_api_get_item_batch"),
+    path("scanner/api/heartbeat-item-batch/", scanner_views.heartbeat_item_batch, name="scanner_api_heartbeat_item_batch"),
     path("scanner/api/submit-item-batch/", scanner_views.submit_item_prices, name="scanner_api_submit_item_batch"),
 
     # API Endpoints
@@ -19,5 +19,7 @@ exec su -s /bin/sh -c '
     python manage.py collectstatic --no-input --clear
 
     echo "Starting Gunicorn..."
-    gunicorn cs_trade_portfolio.wsgi:application --bind 0.0.0.0:8000
+    # Workers com threads: o long-poll de get-item-batch (?wait=) segura uma thread, não o processo inteiro
+    gunicorn cs_trade_portfolio.wsgi:application --bind 0.0.0.0:8000 \
+        --worker-class gthread --workers "${GUNICORN_WORKERS:-3}" --threads "${GUNICORN_THREADS:-8}" --timeout 60
 ' app
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ScannedItem, BlackList, SchedulerLogs, Item, Collection, Crate
+from .models import ScannedItem, LatestPrice, PriceRollup, ScanGeneration, BlackList, SchedulerLogs, Item, Collection, Crate, MarketplaceId, SyncState, RateBudget, PricingJob
 
 @admin.register(ScannedItem)
 class ScannedItemAdmin(admin.ModelAdmin):
@@ -8,6 +8,26 @@ class ScannedItemAdmin(admin.ModelAdmin):
     list_filter = ('source', 'timestamp')
     search_fields = ('name',)
 
+@admin.register(LatestPrice)
+class LatestPriceAdmin(admin.ModelAdmin):
+    """Admin view for Latest Prices."""
+    list_display = ('name', 'source', 'price', 'offers', 'diff', 'timestamp')
+    list_filter = ('source',)
+    search_fields = ('name',)
+
+@admin.register(PriceRollup)
+class PriceRollupAdmin(admin.ModelAdmin):
+    """Admin view for Price Rollups."""
+    list_display = ('name', 'resolution', 'bucket', 'open', 'high', 'low', 'close', 'samples')
+    list_filter = ('resolution', 'bucket')
+    search_fields = ('name',)
+
+@admin.register(ScanGeneration)
+class ScanGenerationAdmin(admin.ModelAdmin):
+    """Admin view for Scan Generations."""
+    list_display = ('id', 'created_at', 'item_count', 'inserted', 'updated', 'deleted')
+    list_filter = ('created_at',)
+
 @admin.register(BlackList)
 class BlackListAdmin(admin.ModelAdmin):
     """Admin view for Blacklisted Items."""
@@ -24,7 +44,7 @@ class SchedulerLogsAdmin(admin.ModelAdmin):
 @admin.register(Item)
 class ItemAdmin(admin.ModelAdmin):
     """Admin view for Items."""
-    list_display = ('name', 'price', 'offers', 'price_time', 'real_rarity', 'category', 'special')
+    list_display = ('name', 'price', 'offers', 'price_time', 'priority', 'real_rarity', 'category', 'special')
     search_fields = ('name', 'market_hash_name')
     list_filter = ('category', 'real_rarity', 'special', 'price_time')
     # Deixa os campos M2M como apenas leitura no admin para evitar erros
@@ -40,4 +60,27 @@ class CollectionAdmin(admin.ModelAdmin):
 class CrateAdmin(admin.ModelAdmin):
     """Admin view for Crates."""
     list_display = ('name', 'id')
-    search_fields = ('name', 'id')
\ No newline at end of file
+    search_fields = ('name', 'id')
+
+@admin.register(MarketplaceId)
+class MarketplaceIdAdmin(admin.ModelAdmin):
+    """Admin view for Marketplace IDs."""
+    list_display = ('market_hash_name', 'buff163_id', 'youpin_id', 'updated_at')
+    search_fields = ('name', 'market_hash_name')
+
+@admin.register(SyncState)
+class SyncStateAdmin(admin.ModelAdmin):
+    """Admin view for Sync States."""
+    list_display = ('key', 'updated_at')
+
+@admin.register(RateBudget)
+class RateBudgetAdmin(admin.ModelAdmin):
+    """Admin view for Rate Budgets."""
+    list_display = ('name', 'rate', 'capacity', 'tokens', 'updated_at')
+
+@admin.register(PricingJob)
+class PricingJobAdmin(admin.ModelAdmin):
+    """Admin view for Pricing Jobs (leases)."""
+    list_display = ('item', 'lease_id', 'leased_until', 'attempts')
+    list_filter = ('leased_until',)
+    search_fields = ('item__name', 'lease_id')
@@ -0,0 +1,190 @@
+import csv
+import io
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import LatestPrice, ScannedItem, ScanGeneration, MARKETPLACE_SOURCES
+
+# Abaixo disso o ORM resolve bem; acima, no PostgreSQL, as linhas vão por COPY
+COPY_MIN_ROWS = 200
+ORM_BATCH_SIZE = 500
+# Chave do advisory lock que serializa quem reescreve as ofertas de marketplace
+MARKETPLACE_OFFERS_LOCK = 0x5C4E0001
+
+
+def _use_copy(objs):
+    return connection.vendor == 'postgresql' and len(objs) >= COPY_MIN_ROWS
+
+
+def lock_marketplace_offers():
+    """
+    Serializa, até o fim da transação atual, as escritas nas ofertas de marketplace
+    (`add-items` e `ingest-listings`). O select_for_update só trava linhas que já existem:
+    sem isto, duas ingestões podiam inserir o mesmo item ao mesmo tempo. No PostgreSQL é um
+    advisory lock; no SQLite as transações de escrita já são serializadas pelo banco.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [MARKETPLACE_OFFERS_LOCK])
+
+
+def _copy_rows(cursor, table, columns, rows):
+    """Envia as linhas para `table` com um único `COPY ... FROM STDIN` (psycopg2 ou psycopg 3)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([r'\N' if value is None else value for value in row])
+    quoted_columns = ', '.join(connection.ops.quote_name(column) for column in columns)
+    sql = f"COPY {table} ({quoted_columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, 'copy_expert'):
+        buffer.seek(0)
+        raw_cursor.copy_expert(sql, buffer)
+    else:
+        with raw_cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def bulk_insert(objs):
+    """
+    Equivalente a `bulk_create` para ingestões grandes.
+
+    No PostgreSQL as linhas são enviadas por `COPY` direto para a tabela (um único
+    round trip, sem milhares de parâmetros). Os objetos não recebem o `id` gerado.
+    Em outros bancos (SQLite em desenvolvimento) cai no `bulk_create` do ORM.
+    """
+    if not objs:
+        return 0
+    model = type(objs[0])
+    if not _use_copy(objs):
+        model.objects.bulk_create(objs, batch_size=ORM_BATCH_SIZE)
+        return len(objs)
+
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, models.AutoField)]
+    rows = (
+        [field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields]
+        for obj in objs
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        _copy_rows(cursor, connection.ops.quote_name(model._meta.db_table), [field.column for field in fields], rows)
+    return len(objs)
+
+
+def bulk_update_rows(objs, field_names):
+    """
+    Equivalente a `bulk_update` sem o `CASE WHEN` gigante que o ORM gera.
+
+    No PostgreSQL as linhas vão por `COPY` para uma tabela temporária e são aplicadas
+    com um único `UPDATE ... FROM`. Retorna o número de linhas atualizadas.
+    """
+    if not objs:
+        return 0
+    model = type(objs[0])
+    if not _use_copy(objs):
+        return model.objects.bulk_update(objs, field_names, batch_size=ORM_BATCH_SIZE)
+
+    opts = model._meta
+    quote = connection.ops.quote_name
+    fields = [opts.pk] + [opts.get_field(name) for name in field_names]
+    table = quote(opts.db_table)
+    staging = quote(f"{opts.db_table}_staging")
+    columns = [field.column for field in fields]
+    assignments = ', '.join(f"{quote(column)} = staging.{quote(column)}" for column in columns[1:])
+    rows = (
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields]
+        for obj in objs
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {', '.join(quote(column) for column in columns)} FROM {table} WITH NO DATA"
+        )
+        _copy_rows(cursor, staging, columns, rows)
+        pk_column = quote(opts.pk.column)
+        cursor.execute(
+            f"UPDATE {table} AS target SET {assignments} "
+            f"FROM {staging} AS staging WHERE target.{pk_column} = staging.{pk_column}"
+        )
+        return cursor.rowcount
+
+
+@transaction.atomic
+def ingest_snapshot(items):
+    """
+    Aplica uma varredura completa dos marketplaces como uma nova geração.
+
+    Em vez de apagar tudo e reinserir, calcula o delta contra o que está no banco:
+    insere itens novos, atualiza apenas os que mudaram de preço, fonte ou link e
+    remove os que sumiram. Tudo roda numa única transação, então quem lê a tabela
+    vê a geração anterior completa ou a nova completa, nunca uma tabela pela metade.
+    """
+    now = timezone.now()
+    lock_marketplace_offers()
+    generation = ScanGeneration.objects.create(item_count=len(items))
+
+    incoming = {item['name']: item for item in items}
+    existing = {}
+    duplicated_ids = []
+    for scanned in ScannedItem.objects.select_for_update().filter(source__in=MARKETPLACE_SOURCES):
+        if scanned.name in existing:
+            duplicated_ids.append(scanned.id)
+        else:
+            existing[scanned.name] = scanned
+
+    items_to_create = []
+    items_to_update = []
+    for name, item in incoming.items():
+        price = Decimal(str(item['price'])).quantize(Decimal("0.01"))
+        scanned = existing.pop(name, None)
+        if scanned is None:
+            items_to_create.append(ScannedItem(name=name, price=price, source=item['source'], link=item['link'], generation=generation))
+        elif scanned.price != price or scanned.source != item['source'] or scanned.link != item['link']:
+            scanned.price = price
+            scanned.source = item['source']
+            scanned.link = item['link']
+            scanned.diff = None
+            scanned.generation = generation
+            scanned.timestamp = now
+            items_to_update.append(scanned)
+
+    # O que sobrou em `existing` não está mais à venda
+    ids_to_delete = duplicated_ids + [scanned.id for scanned in existing.values()]
+    if ids_to_delete:
+        ScannedItem.objects.filter(id__in=ids_to_delete).delete()
+    bulk_update_rows(items_to_update, ['price', 'source', 'link', 'diff', 'generation', 'timestamp'])
+    bulk_insert(items_to_create)
+
+    generation.inserted = len(items_to_create)
+    generation.updated = len(items_to_update)
+    generation.deleted = len(ids_to_delete)
+    generation.save(update_fields=['inserted', 'updated', 'deleted'])
+    return generation
+
+
+def record_latest_prices(objs):
+    """
+    Atualiza LatestPrice com os ScannedItem recém-gravados (upsert em (name, source)).
+    Deve rodar na mesma transação que grava o histórico, para as duas tabelas nunca
+    divergirem. Se o mesmo item vier repetido, vale a última ocorrência.
+    """
+    now = timezone.now()
+    latest = {}
+    for obj in objs:
+        latest[(obj.name, obj.source)] = LatestPrice(
+            name=obj.name, source=obj.source, price=obj.price, offers=obj.offers,
+            link=obj.link, diff=None, timestamp=obj.timestamp or now,
+        )
+    if not latest:
+        return 0
+    LatestPrice.objects.bulk_create(
+        list(latest.values()),
+        update_conflicts=True,
+        unique_fields=['name', 'source'],
+        update_fields=['price', 'offers', 'link', 'diff', 'timestamp'],
+        batch_size=ORM_BATCH_SIZE,
+    )
+    return len(latest)
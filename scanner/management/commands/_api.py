@@ -0,0 +1,110 @@
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from scanner.services import buff, rate_budget
+from scanner.services.codecs import ApiCodec, PayloadError
+from scanner.services.http_client import HttpClient
+from scanner.services.ratelimit import AdaptiveRateLimiter
+
+class ScannerApiCommand(BaseCommand):
+    """
+    Base para os comandos que conversam com a API do scanner.
+
+    Todas as chamadas passam por um único `HttpClient` (conexões reaproveitadas,
+    timeout padrão e circuit breaker), em vez de abrir uma conexão nova a cada requisição.
+    Os corpos são negociados com o servidor: msgpack e gzip/zstd quando disponíveis.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.api_base_url = settings.SCANNER_API_BASE_URL
+        self.codec = ApiCodec()
+        self.headers = {
+            "Content-Type": "application/json",
+            "X-API-KEY": settings.SCANNER_API_KEY,
+            **self.codec.request_headers()
+        }
+        self.api_client = HttpClient(timeout=(5, 60), headers=self.headers)
+
+    def _api_request(self, method, endpoint, data=None):
+        """Função auxiliar para fazer requisições à API."""
+        url = f"{self.api_base_url}/{endpoint}/"
+        try:
+            if method.upper() == 'GET':
+                response = self.api_client.get(url)
+            elif method.upper() == 'POST':
+                body, headers = self.codec.encode_request(data)
+                response = self.api_client.post(url, data=body, headers=headers)
+            else:
+                raise ValueError("Unsupported HTTP method")
+
+            response.raise_for_status()
+            return self.codec.decode_response(response)
+        except PayloadError as e:
+            self.stdout.write(self.style.ERROR(f"API Error at {endpoint}: {e}"))
+            return None
+        except requests.RequestException as e:
+            self.stdout.write(self.style.ERROR(f"API Error at {endpoint}: {e}"))
+            if e.response is not None:
+                self.stdout.write(self.style.ERROR(f"Response: {e.response.text}"))
+            return None
+
+    def _send_log_to_api(self, message):
+        """Função auxiliar para enviar a mensagem de log para a API."""
+        self.stdout.write("\nSending final summary to log API...")
+        self._api_request('POST', 'logs', {"message": message})
+        self.stdout.write("-> Log sent.")
+
+    def _add_buff_arguments(self, parser):
+        """Opções da busca concorrente de preços no Buff, comuns aos comandos de precificação."""
+        parser.add_argument('--buff-workers', type=int, default=4, help='Consultas simultâneas ao Buff.')
+        parser.add_argument('--buff-rate', type=float, default=2, help='Taxa inicial de consultas ao Buff (req/s).')
+        parser.add_argument('--buff-max-rate', type=float, default=8, help='Taxa máxima de consultas ao Buff (req/s).')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Preços enviados por requisição ao update-buff-prices.')
+
+    def _update_buff_prices(self, item_names, buff_workers=4, buff_rate=2, buff_max_rate=8, chunk_size=50, skip_zero=False,
+                            priority=rate_budget.CATALOGUE, **kwargs):
+        """
+        Busca os preços Buff com concorrência e taxa limitadas e envia os resultados ao
+        `update-buff-prices` em blocos de `chunk_size`, à medida que chegam. Cada consulta
+        também consome o orçamento compartilhado do Buff com a prioridade informada.
+        Retorna `(encontrados, não encontrados, atualizados pela API)`.
+        """
+        local_limiter = AdaptiveRateLimiter(rate=buff_rate, max_rate=buff_max_rate)
+        limiter = rate_budget.SharedBudgetLimiter(priority, local=local_limiter)
+        total = len(item_names)
+        chunk = []
+        fetched = not_found = updated = 0
+
+        def send(chunk):
+            self.stdout.write(self.style.SUCCESS(f'Sending {len(chunk)} fetched Buff prices to the API...'))
+            response_data = self._api_request('POST', 'update-buff-prices', {"items": chunk})
+            if not response_data:
+                self.stdout.write(self.style.ERROR('API call to update-buff-prices failed or returned no data.'))
+                return 0
+            self.stdout.write(self.style.SUCCESS(f'-> API reported {response_data.get("updated_items", 0)} items updated.'))
+            return response_data.get("updated_items", 0)
+
+        try:
+            results = buff.get_items_info(item_names, max_workers=buff_workers, limiter=limiter)
+            for index, (item_name, buff_info) in enumerate(results, start=1):
+                if not buff_info:
+                    not_found += 1
+                    self.stdout.write(self.style.WARNING(f"  {index}/{total}: '{item_name}' not found on Buff."))
+                    continue
+                buff_info['name'] = item_name
+                self.stdout.write(f"  {index}/{total}: Fetched '{item_name}' - Price: {buff_info['price']}")
+                if skip_zero and abs(buff_info['price']) < 0.01:
+                    continue
+                fetched += 1
+                chunk.append(buff_info)
+                if len(chunk) >= chunk_size:
+                    updated += send(chunk)
+                    chunk = []
+        finally:
+            # Mesmo se a busca for interrompida, o que já foi buscado é enviado
+            if chunk:
+                updated += send(chunk)
+        self.stdout.write(f'-> Buff rate settled at {local_limiter.rate:.2f} req/s.')
+        return fetched, not_found, updated
@@ -0,0 +1,133 @@
+import asyncio
+import importlib
+import os
+import shlex
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from scanner.models import MarketplaceId
+from scanner.services import http_client
+from scanner.services.ratelimit import AdaptiveRateLimiter
+from scanner.services.simulator import MarketSimulator, SimulatorConfig
+from scanner.services.utils import clear_item_name
+
+STAGES = ['scanner', 'pricing', 'worker']
+
+
+class Command(BaseCommand):
+    help = (
+        'Roda run_scanner, run_pricing e worker.py contra um simulador local dos marketplaces e mede o throughput. '
+        'Tudo roda num banco de teste descartável, criado e removido pelo próprio comando.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Etapas a medir.')
+        parser.add_argument('--latency', type=float, default=80, help='Latência média por requisição (ms).')
+        parser.add_argument('--jitter', type=float, default=40, help='Variação da latência (ms).')
+        parser.add_argument('--pages', type=int, default=5, help='Número de páginas de cada marketplace.')
+        parser.add_argument('--items-per-page', type=int, default=60, help='Itens por página.')
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fração de respostas 429 (0 a 1).')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas 503 (0 a 1).')
+        parser.add_argument('--batch-size', type=int, default=20, help='Tamanho dos lotes de run_pricing e do worker.')
+        parser.add_argument('--fixtures', default=None, help='Diretório com respostas gravadas (<rota>.json).')
+        parser.add_argument('--worker-max-rate', type=float, default=None, help='Taxa máxima do worker no Buff (req/s). Padrão: a do worker.')
+        parser.add_argument('--worker-batches', type=int, default=1, help='Lotes entregues ao worker.')
+        parser.add_argument('--worker-concurrency', type=int, default=None, help='Roda o worker em modo pipeline com esta concorrência.')
+        parser.add_argument('--scanner-args', nargs='*', default=[], help='Argumentos extras repassados ao run_scanner (ex.: "--scanner-args=--sequential --buff-workers=8").')
+        parser.add_argument('--show-output', action='store_true', help='Mostra a saída dos comandos medidos.')
+        parser.add_argument('--keepdb', action='store_true', help='Reaproveita o banco de teste entre execuções.')
+
+    def handle(self, *args, **options):
+        config = SimulatorConfig(
+            latency_ms=options['latency'],
+            jitter_ms=options['jitter'],
+            pages=options['pages'],
+            items_per_page=options['items_per_page'],
+            throttle_rate=options['throttle_rate'],
+            error_rate=options['error_rate'],
+            batch_size=options['batch_size'],
+            worker_batches=options['worker_batches'],
+            fixtures_dir=options['fixtures'],
+        )
+        # As etapas gravam preços, filas e orçamentos: nunca no banco configurado, só num banco de teste
+        if connection.vendor == 'sqlite':
+            # O SQLite de teste em memória trava tabelas inteiras entre threads; um arquivo temporário não
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'benchmark_scanner.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'], serialized_aliases=set())
+        simulator = MarketSimulator(config).start()
+        http_client.set_upstream_override(simulator.base_url)
+        if not settings.SCANNER_API_KEY:
+            settings.SCANNER_API_KEY = 'benchmark'
+        self.stdout.write(self.style.SUCCESS(f'--- Simulador rodando em {simulator.base_url} ---'))
+
+        results = []
+        try:
+            self._seed_ids(simulator)
+            for stage in options['stages']:
+                simulator.reset_counts()
+                output = StringIO()
+                start = time.monotonic()
+                items = getattr(self, f'_run_{stage}')(simulator, options, output)
+                elapsed = time.monotonic() - start
+                counts = dict(simulator.counts)
+                results.append((stage, items, elapsed, counts))
+                if options['show_output']:
+                    self.stdout.write(output.getvalue())
+        finally:
+            http_client.set_upstream_override(None)
+            simulator.stop()
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        self.stdout.write(f"\n{'Etapa':<10}{'Itens':>8}{'Tempo (s)':>12}{'Itens/s':>10}{'Requisições':>14}{'429':>6}{'5xx':>6}")
+        for stage, items, elapsed, counts in results:
+            rate = items / elapsed if elapsed else 0
+            self.stdout.write(
+                f"{stage:<10}{items:>8}{elapsed:>12.2f}{rate:>10.1f}{counts.get('requests', 0):>14}"
+                f"{counts.get('429', 0):>6}{counts.get('5xx', 0):>6}"
+            )
+            routes = ', '.join(f"{route}={count}" for route, count in sorted(counts.items()) if route not in ('requests', '429', '5xx'))
+            self.stdout.write(f"  -> {routes}")
+
+    def _seed_ids(self, simulator):
+        # Com o upstream simulado o id_registry não grava nada: os IDs do catálogo entram direto no banco de teste
+        MarketplaceId.objects.bulk_create(
+            [
+                MarketplaceId(name=clear_item_name(name), market_hash_name=name, buff163_id=simulator.ids[clear_item_name(name)])
+                for name in simulator.catalogue
+            ],
+            ignore_conflicts=True,
+        )
+
+    def _run_scanner(self, simulator, options, output):
+        call_command('run_scanner', *shlex.split(' '.join(options['scanner_args'])), stdout=output)
+        return simulator.received['scanned']
+
+    def _run_pricing(self, simulator, options, output):
+        call_command('run_pricing', stdout=output)
+        return simulator.received['buff_prices']
+
+    def _run_worker(self, simulator, options, output):
+        worker = importlib.import_module('scanner.management.commands.worker')
+        # O simulador tem um número fixo de lotes: o worker deve encerrar quando a fila esvazia
+        worker.WORKER_LONG_POLL = 0
+        if options['worker_max_rate'] is not None:
+            worker.buff_limiter = AdaptiveRateLimiter(
+                rate=min(worker.BUFF_RATE, options['worker_max_rate']), min_rate=worker.BUFF_MIN_RATE,
+                max_rate=options['worker_max_rate'], latency_target=worker.BUFF_LATENCY_TARGET,
+            )
+        if options['worker_concurrency']:
+            asyncio.run(worker.PipelinedWorker(options['worker_concurrency'], worker.WORKER_BATCHES).run())
+            return simulator.received['item_prices']
+
+        while (work_data := worker.get_work_batch()) and work_data.get("items_to_price"):
+            lease_id = work_data.get("lease_id")
+            results_payload = worker.price_batch(work_data["items_to_price"], lease_id, work_data.get("lease_seconds"))
+            worker.submit_work_batch(results_payload, work_data.get("cny_brl_rate"), lease_id)
+        return simulator.received['item_prices']
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from scanner import partitions
+
+
+class Command(BaseCommand):
+    help = 'Particionamento mensal da tabela de ScannedItem (PostgreSQL): converte a tabela e cria as partições futuras.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Converte a tabela atual em particionada (trava a tabela durante a cópia).')
+        parser.add_argument('--ahead', type=int, default=partitions.PARTITIONS_AHEAD, help='Meses futuros com partição já criada.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write("-> Particionamento disponível apenas no PostgreSQL; nada a fazer.")
+            return
+
+        if options['convert']:
+            if partitions.is_partitioned():
+                raise CommandError("A tabela de ScannedItem já está particionada.")
+            self.stdout.write(self.style.SUCCESS("--- Convertendo ScannedItem em tabela particionada por mês ---"))
+            copied = partitions.convert(ahead=options['ahead'])
+            self.stdout.write(self.style.SUCCESS(f"-> {copied} linhas copiadas para as partições."))
+            return
+
+        if not partitions.is_partitioned():
+            self.stdout.write("-> Tabela não particionada (use --convert para ativar); nada a fazer.")
+            return
+        created = partitions.ensure_partitions(ahead=options['ahead'])
+        self.stdout.write(self.style.SUCCESS(f"-> {created} partições futuras criadas."))
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from scanner.management.commands._api import ScannerApiCommand
+from scanner.services import crawler, markets
+
+
+class SeenListings:
+    """Conjunto limitado (LRU) dos anúncios `(fonte, id)` já vistos pelo poller."""
+
+    def __init__(self, capacity=50000):
+        self.capacity = capacity
+        self._seen = OrderedDict()
+
+    def add(self, key):
+        """Registra o anúncio e retorna True se ele ainda não tinha sido visto."""
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            return False
+        self._seen[key] = None
+        if len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+        return True
+
+
+class Command(ScannerApiCommand):
+    help = 'Consulta em intervalos curtos as primeiras páginas de cada marketplace e envia apenas os anúncios novos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30, help='Intervalo entre consultas (s).')
+        parser.add_argument('--pages', type=int, default=1, help='Quantas páginas iniciais de cada fonte consultar.')
+        parser.add_argument('--max-per-host', type=int, default=2, help='Requisições simultâneas por marketplace.')
+        parser.add_argument('--seen-capacity', type=int, default=50000, help='Quantos anúncios já vistos manter em memória.')
+        parser.add_argument('--iterations', type=int, default=0, help='Número de ciclos (0 = sem fim).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('--- Starting Listings Poller (API Mode) ---'))
+        jobs = crawler.jobs_from_profiles(settings.SCANNER_SCAN_PROFILES)
+        seen = SeenListings(options['seen_capacity'])
+        pool = crawler.PagePool(max_per_host=options['max_per_host'])
+
+        iteration = 0
+        try:
+            while not options['iterations'] or iteration < options['iterations']:
+                iteration += 1
+                cycle_start = time.monotonic()
+                try:
+                    self._poll_once(jobs, pool, seen, options['pages'])
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'Poll cycle failed: {e}'))
+                elapsed = time.monotonic() - cycle_start
+                if not options['iterations'] or iteration < options['iterations']:
+                    time.sleep(max(0, options['interval'] - elapsed))
+        except KeyboardInterrupt:
+            self.stdout.write('Poller interrupted.')
+        finally:
+            pool.shutdown()
+
+    def _poll_once(self, jobs, pool, seen, pages):
+        new_offers = []
+        for name, min_price, max_price, _ in jobs:
+            source = markets.get_source(name)
+            for offer in source.offers(min_price, max_price, pool, max_pages=pages):
+                if offer.listing_id is None or seen.add((offer.source, offer.listing_id)):
+                    new_offers.append(offer)
+
+        if not new_offers:
+            self.stdout.write('-> No new listings.')
+            return
+
+        products = markets.collect(new_offers)
+        api_payload = {"items": [{"name": name, "price": info['price'], "source": info['source'], "link": info['link']} for name, info in products.items()]}
+        response_data = self._api_request('POST', 'ingest-listings', api_payload)
+        if not response_data:
+            return
+
+        ingested = response_data.get("ingested_items", 0)
+        items_to_update = response_data.get("items_to_update", [])
+        self.stdout.write(f'-> {len(new_offers)} new listings, {ingested} ingested, {len(items_to_update)} need a Buff price.')
+
+        if items_to_update:
+            self._update_buff_prices(items_to_update)
+
+        if ingested:
+            response_data = self._api_request('POST', 'calculate-differences', {"names": list(products)})
+            if response_data:
+                self.stdout.write(self.style.SUCCESS(f'-> Differences updated for {response_data.get("processed_items", 0)} items.'))
@@ -0,0 +1,27 @@
+import requests
+from django.core.management.base import BaseCommand
+
+from scanner.services import id_registry
+
+
+class Command(BaseCommand):
+    help = 'Atualiza o registro local de IDs dos marketplaces (buff163, youpin) a partir do GitHub.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Ignora o ETag e baixa o arquivo completo.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("--- Atualizando registro de IDs dos marketplaces ---"))
+        try:
+            state = id_registry.refresh(force=options['force'])
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self.stdout.write(self.style.ERROR(f"Erro ao atualizar o registro de IDs: {e}"))
+            return
+
+        if state.data.get("not_modified"):
+            self.stdout.write("-> Registro já está atualizado (304 Not Modified).")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"-> {state.data.get('items', 0)} itens no registro: "
+                f"{state.data.get('changed', 0)} novos/alterados, {state.data.get('removed', 0)} removidos."
+            ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from scanner.scheduling import rescore_items
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a prioridade de precificação dos itens (idade do preço, valor em carteira, donos e volatilidade).'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("--- Recalculando prioridades de precificação ---"))
+        changed = rescore_items()
+        self.stdout.write(self.style.SUCCESS(f"-> {changed} itens com a prioridade alterada."))
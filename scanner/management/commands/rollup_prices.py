@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from scanner import rollups
+
+
+class Command(BaseCommand):
+    help = 'Resume o histórico de preços do Buff em agregados OHLC por hora e por dia e apaga o que passou da retenção.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-prune', action='store_true', help='Só gera os agregados, sem apagar nada.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("--- Resumindo o histórico de preços do Buff ---"))
+        hourly, daily = rollups.roll_up()
+        self.stdout.write(f"-> {hourly} agregados por hora e {daily} por dia gravados.")
+
+        if options['no_prune']:
+            return
+        raw_deleted, hourly_deleted, dropped = rollups.prune()
+        if dropped:
+            self.stdout.write(f"-> Partições removidas: {', '.join(dropped)}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"-> {raw_deleted} linhas brutas e {hourly_deleted} agregados por hora apagados pela retenção."
+        ))
@@ -1,58 +1,54 @@
-import os
-import requests
-import json
-from decimal import Decimal
-from django.core.management.base import BaseCommand
+import time
 from django.conf import settings
-from scanner.services import dash_bot, dash_p2p, br_skins, buff
+from scanner.services import crawler, markets
+from scanner.management.commands._api import ScannerApiCommand
 
-# Classe auxiliar para serializar objetos Decimal para JSON
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return str(obj)
-        return super(DecimalEncoder, self).default(obj)
-
-class Command(BaseCommand):
+class Command(ScannerApiCommand):
     help = 'Runs the full scanner script by interacting with the API.'
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.api_base_url = "https://cstrack.online/scanner/api"
-        # self.api_base_url = "http://localhost:8000/scanner/api"
-        self.headers = {
-            "Content-Type": "application/json",
-            "X-API-KEY": settings.SCANNER_API_KEY
-        }
-
-    def _api_request(self, method, endpoint, data=None):
-        """Função auxiliar para fazer requisições à API."""
-        url = f"{self.api_base_url}/{endpoint}/"
-        try:
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=self.headers)
-            elif method.upper() == 'POST':
-                response = requests.post(url, headers=self.headers, data=json.dumps(data, cls=DecimalEncoder))
-            else:
-                raise ValueError("Unsupported HTTP method")
-            
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            self.stdout.write(self.style.ERROR(f"API Error at {endpoint}: {e}"))
-            if e.response:
-                self.stdout.write(self.style.ERROR(f"Response: {e.response.text}"))
-            return None
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sequential',
+            action='store_true',
+            help='Busca as fontes e páginas uma após a outra (modo antigo, sem concorrência).',
+        )
+        parser.add_argument(
+            '--max-per-host',
+            type=int,
+            default=4,
+            help='Número máximo de requisições simultâneas por marketplace no modo concorrente.',
+        )
+        parser.add_argument(
+            '--min-discount',
+            type=float,
+            default=settings.SCANNER_MIN_DISCOUNT,
+            help='Para de paginar feeds ordenados por desconto quando nenhuma oferta da página tem este desconto (%%).',
+        )
+        parser.add_argument(
+            '--min-reference-ratio',
+            type=float,
+            default=settings.SCANNER_MIN_REFERENCE_RATIO,
+            help='Para de paginar quando nenhuma oferta da página tem preço Buff / preço acima desta razão (ex.: 1.05).',
+        )
+        self._add_buff_arguments(parser)
 
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.SUCCESS('--- Starting Scanner Script (API Mode) ---'))
 
         # SEÇÃO 1: BUSCAR ITENS DA DASH E ENVIAR PARA A API
         self.stdout.write('Step 1: Fetching items from Dash and sending to API...')
-        products = {}
-        products = dash_p2p.get_items(products, 25, 500, 20)
-        products = dash_bot.get_items(products, 25, 300, 80)
-        products = br_skins.get_items(products, 25, 350, 80)
+        jobs = crawler.jobs_from_profiles(settings.SCANNER_SCAN_PROFILES)
+        self.stdout.write(f'-> {len(jobs)} scan jobs: ' + ', '.join(f'{name} {min_price}-{max_price}' for name, min_price, max_price, _ in jobs))
+        thresholds = self._get_thresholds(kwargs['min_discount'], kwargs['min_reference_ratio'])
+        crawl_start = time.monotonic()
+        if kwargs['sequential']:
+            products = {}
+            for name, min_price, max_price, limit in jobs:
+                source = markets.get_source(name)
+                products = markets.collect(source.offers(min_price, max_price, thresholds=thresholds), products, limit, source.label)
+        else:
+            products = crawler.crawl(jobs, max_per_host=kwargs['max_per_host'], thresholds=thresholds)
+        self.stdout.write(f'-> Crawl finished in {time.monotonic() - crawl_start:.1f}s with {len(products)} products.')
         
         if not products:
             self.stdout.write(self.style.WARNING('No products found on Dash. Exiting.'))
@@ -66,7 +62,9 @@ class Command(BaseCommand):
             return
         
         created_count = response_data.get("created_items", "N/A")
-        self.stdout.write(self.style.SUCCESS(f'-> API reported {created_count} items created.'))
+        updated_count = response_data.get("updated_items", 0)
+        deleted_count = response_data.get("deleted_items", 0)
+        self.stdout.write(self.style.SUCCESS(f'-> API reported {created_count} items created, {updated_count} updated, {deleted_count} removed.'))
 
         # SEÇÃO 2: OBTER LISTA DE ITENS PARA ATUALIZAR E BUSCAR PREÇOS DO BUFF
         self.stdout.write('Step 2: Getting items list and updating Buff prices...')
@@ -79,23 +77,7 @@ class Command(BaseCommand):
         items_to_update = response_data.get("items_to_update", [])
         self.stdout.write(f'-> Found {len(items_to_update)} items needing a Buff price update.')
         
-        buff_prices_payload = []
-        try:
-            for index, item_name in enumerate(items_to_update):
-                buff_info = buff.get_item_info(item_name)
-                if buff_info:
-                    buff_info['name'] = item_name  # Ensure the name is included
-                    self.stdout.write(f"  {index + 1}/{len(items_to_update)}: Fetched '{item_name}' - Price: {buff_info['price']}")
-                    buff_prices_payload.append(buff_info)
-                else:
-                    self.stdout.write(self.style.WARNING(f"  {index + 1}/{len(items_to_update)}: '{item_name}' not found on Buff."))
-        finally:
-            if buff_prices_payload:
-                self.stdout.write(self.style.SUCCESS(f'Sending {len(buff_prices_payload)} fetched Buff prices to the API...'))
-                response_data = self._api_request('POST', 'update-buff-prices', {"items": buff_prices_payload})
-                if response_data:
-                    updated_count = response_data.get("updated_items", "N/A")
-                    self.stdout.write(self.style.SUCCESS(f'-> API reported {updated_count} items updated.'))
+        self._update_buff_prices(items_to_update, **kwargs)
 
         # SEÇÃO 3: ACIONAR O CÁLCULO DE DIFERENÇAS
         self.stdout.write('Step 3: Triggering price difference calculation...')
@@ -105,4 +87,13 @@ class Command(BaseCommand):
             processed_count = response_data.get("processed_items", "N/A")
             self.stdout.write(self.style.SUCCESS(f'-> Calculation triggered. API processed {processed_count} items.'))
 
-        self.stdout.write(self.style.SUCCESS('--- Scanner Script Finished ---'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('--- Scanner Script Finished ---'))
+
+    def _get_thresholds(self, min_discount, min_reference_ratio):
+        """Monta os limiares de parada antecipada, buscando os preços de referência na API se necessário."""
+        reference_prices = None
+        if min_reference_ratio is not None:
+            response_data = self._api_request('GET', 'reference-prices')
+            reference_prices = response_data.get("prices", {}) if response_data else {}
+            self.stdout.write(f'-> Loaded {len(reference_prices)} reference prices for early termination.')
+        return markets.ScanThresholds(min_discount, min_reference_ratio, reference_prices)
@@ -2,6 +2,7 @@ import requests
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from scanner.models import Item, Collection, Crate
+from scanner.services import http_client
 
 API_URL_SKINS = "https://raw.githubusercontent.com/ByMykel/CSGO-API/main/public/api/en/skins.json"
 API_URL_SKINS_NOT_GROUPED = "https://raw.githubusercontent.com/ByMykel/CSGO-API/main/public/api/en/skins_not_grouped.json"
@@ -29,7 +30,7 @@ class Command(BaseCommand):
         e criar um mapa de relações (item_id -> [collections, crates]).
         """
         self.stdout.write(f"Buscando coleções e caixas de: {API_URL_SKINS}")
-        response = requests.get(API_URL_SKINS)
+        response = http_client.get(API_URL_SKINS, timeout=(5, 120))
         response.raise_for_status()
         skins_data = response.json()
 
@@ -91,7 +92,7 @@ class Command(BaseCommand):
         Adiciona apenas itens que ainda não existem no banco.
         """
         self.stdout.write(f"Buscando todos os itens de: {API_URL_SKINS_NOT_GROUPED}")
-        response = requests.get(API_URL_SKINS_NOT_GROUPED)
+        response = http_client.get(API_URL_SKINS_NOT_GROUPED, timeout=(5, 120))
         response.raise_for_status()
         all_items_data = response.json()
 
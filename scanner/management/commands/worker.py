@@ -1,20 +1,53 @@
+import argparse
+import asyncio
 import requests
+import signal
 import time
-import json
-from random import uniform, randint
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Permite rodar como script (python scanner/management/commands/worker.py) e ainda importar scanner.services
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from scanner.services.codecs import ApiCodec, PayloadError
+from scanner.services.http_client import HttpClient
+from scanner.services.journal import ResultJournal
+from scanner.services.ratelimit import AdaptiveRateLimiter, GrantPool
 
 # --- CONFIGURAÇÃO ---
 # Altere para a URL do seu servidor e sua API Key
 API_BASE_URL = "https://cstrack.online"
 # API_BASE_URL = "http://127.0.0.1:8000"
 API_KEY = "APIKEY"
+
+# Limites de requisições ao Buff deste worker (req/s). A taxa começa em BUFF_RATE e se
+# ajusta sozinha entre o mínimo e o máximo conforme 429s, erros e latência observados.
+BUFF_RATE = float(os.environ.get("BUFF_RATE", "1"))
+BUFF_MIN_RATE = float(os.environ.get("BUFF_MIN_RATE", "0.2"))
+BUFF_MAX_RATE = float(os.environ.get("BUFF_MAX_RATE", "5"))
+# Latência (s) acima da qual o Buff é considerado sobrecarregado
+BUFF_LATENCY_TARGET = float(os.environ.get("BUFF_LATENCY_TARGET", "3"))
+# Intervalo máximo (s) entre heartbeats do lease; o servidor também informa a duração do lease
+HEARTBEAT_INTERVAL = float(os.environ.get("HEARTBEAT_INTERVAL", "60"))
+# Espera máxima (s) por trabalho novo em cada get-item-batch (long-poll); 0 = encerra quando a fila esvazia
+WORKER_LONG_POLL = float(os.environ.get("WORKER_LONG_POLL", "25"))
+# Diário local dos preços buscados, reenviados se o worker cair antes de entregá-los
+WORKER_JOURNAL = os.environ.get("WORKER_JOURNAL", "worker_journal.jsonl")
+# Modo pipeline (--pipelined): chamadas simultâneas ao Buff e lotes em andamento ao mesmo tempo
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "4"))
+WORKER_BATCHES = int(os.environ.get("WORKER_BATCHES", "2"))
 # --------------------
 
+# Formato dos corpos trocados com o servidor (msgpack e gzip/zstd quando disponíveis)
+api_codec = ApiCodec()
+
 # Headers para a API do seu servidor
 API_HEADERS = {
     "Content-Type": "application/json",
-    "X-API-KEY": API_KEY
+    "X-API-KEY": API_KEY,
+    **api_codec.request_headers()
 }
 
 # Headers para a API do Buff
@@ -27,18 +60,66 @@ BUFF_HEADERS = {
 # (Se precisar de cookies, adicione-os aqui)
 # BUFF_COOKIES = {...}
 
-def get_work_batch():
-    """Busca um lote de trabalho do servidor Django."""
+# Conexões reaproveitadas (keep-alive) e timeout padrão para o servidor e para o Buff.
+# No Buff as tentativas ficam com o limitador, que precisa enxergar cada 429; por isso
+# também não há circuit breaker (uma rajada de 429 abriria o circuito e o lote seria descartado).
+api_client = HttpClient(timeout=(5, 15), headers=API_HEADERS)
+buff_client = HttpClient(timeout=(5, 10), retries=0, failure_threshold=None, headers=BUFF_HEADERS)
+buff_limiter = AdaptiveRateLimiter(
+    rate=BUFF_RATE, min_rate=BUFF_MIN_RATE, max_rate=BUFF_MAX_RATE, latency_target=BUFF_LATENCY_TARGET
+)
+
+def request_buff_budget(tokens, throttled):
+    """Pede tokens ao orçamento compartilhado do Buff no servidor. Sem resposta, segue só com o limitador local."""
+    url = f"{API_BASE_URL}/scanner/api/rate-budget/"
+    payload, headers = api_codec.encode_request({"priority": "catalogue", "tokens": tokens, "throttled": throttled})
+    try:
+        response = api_client.post(url, data=payload, headers=headers)
+        response.raise_for_status()
+        data = api_codec.decode_response(response)
+        return data.get("granted", 0), data.get("retry_after", 1)
+    except (requests.RequestException, PayloadError) as e:
+        print(f"Erro ao pedir orçamento do Buff ao servidor: {e}")
+        return tokens, 0
+
+# Tokens do orçamento compartilhado com a web e o scheduler, pedidos em lotes
+buff_budget = GrantPool(request_buff_budget)
+
+# Aberto por open_journal() ao rodar como script (o benchmark roda sem diário)
+journal = None
+
+def open_journal(path=WORKER_JOURNAL):
+    global journal
+    journal = ResultJournal(path)
+    return journal
+
+def get_work_batch(wait=0):
+    """
+    Busca um lote de trabalho do servidor Django. Com `wait`, o servidor segura a
+    requisição por até esse tempo (s) esperando surgir trabalho (long-poll).
+    """
     url = f"{API_BASE_URL}/scanner/api/get-item-batch/"
     print("Buscando novo lote de trabalho...")
     try:
-        response = requests.get(url, headers=API_HEADERS, timeout=15)
+        response = api_client.get(url, params={"wait": wait}, timeout=(5, wait + 15)) if wait else api_client.get(url)
         response.raise_for_status()
-        return response.json() # Retorna o JSON completo (incluindo a taxa)
-    except requests.RequestException as e:
+        return api_codec.decode_response(response) # Retorna o payload completo (incluindo a taxa)
+    except (requests.RequestException, PayloadError) as e:
         print(f"Erro ao buscar lote de trabalho: {e}")
         return None
 
+def send_heartbeat(lease_id):
+    """Estende o lease do lote atual. Retorna False se o servidor informou que o lease foi perdido."""
+    url = f"{API_BASE_URL}/scanner/api/heartbeat-item-batch/"
+    payload, headers = api_codec.encode_request({"lease_id": lease_id})
+    try:
+        response = api_client.post(url, data=payload, headers=headers)
+        response.raise_for_status()
+        return api_codec.decode_response(response).get("extended_items", 0) > 0
+    except (requests.RequestException, PayloadError) as e:
+        print(f"Erro ao enviar heartbeat do lease: {e}")
+        return True # Falha de rede: continua; o envio final decide o que é aceito
+
 def call_buff_api(buff_item_id: int):
     """
     Chama a API do Buff para um ID de item específico.
@@ -51,8 +132,19 @@ def call_buff_api(buff_item_id: int):
     
     errors = 0
     while errors < 3:
+        buff_limiter.acquire()
+        buff_budget.acquire()
+        start = time.monotonic()
         try:
-            response = requests.get(buff_api_url, headers=BUFF_HEADERS, timeout=10)
+            response = buff_client.get(buff_api_url)
+            retry_after = response.headers.get("Retry-After")
+            buff_limiter.record(
+                status=response.status_code,
+                latency=time.monotonic() - start,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+            if response.status_code == 429:
+                buff_budget.report_throttled()
             response.raise_for_status()
             data = response.json()
 
@@ -65,34 +157,122 @@ def call_buff_api(buff_item_id: int):
 
         except Exception as e:
             errors += 1
-            print(f"  > Erro na API do Buff (ID: {buff_item_id}): {e}")
-            time.sleep(5)
+            if isinstance(e, requests.RequestException) and not isinstance(e, requests.HTTPError):
+                # Falha de conexão ou timeout: a resposta nem chegou a ser registrada
+                buff_limiter.record(error=True, latency=time.monotonic() - start)
+            print(f"  > Erro na API do Buff (ID: {buff_item_id}): {e} (taxa: {buff_limiter.rate:.2f} req/s)")
     return None
 
-def submit_work_batch(prices_payload, cny_brl_rate):
-    """Envia o lote de preços (em CNY) para o servidor Django."""
-    if not prices_payload:
-        return
+def price_item(item_job):
+    """Busca o preço de um item do lote. Retorna o resultado para o servidor ou None."""
+    buff_data = call_buff_api(item_job.get("buff_item_id"))
+    if not buff_data:
+        return None
+    return {
+        "id": item_job.get("id"),
+        "price_cny": buff_data['price_cny'],
+        "offers": buff_data['offers'],
+        "priced_at": datetime.now(timezone.utc).isoformat() # Torna o reenvio idempotente no servidor
+    }
+
+def record_result(result, lease_id, cny_brl_rate):
+    """Grava o preço no diário antes de qualquer tentativa de envio."""
+    if result and journal:
+        journal.append(lease_id, cny_brl_rate, result)
+    return result
+
+def heartbeat_interval(lease_seconds):
+    return min(HEARTBEAT_INTERVAL, lease_seconds / 3) if lease_seconds else HEARTBEAT_INTERVAL
+
+def price_batch(items_to_price, lease_id=None, lease_seconds=None, cny_brl_rate=None):
+    """
+    Busca no Buff o preço de cada item do lote e retorna o payload de resultados.
+    Com um `lease_id`, envia heartbeats para que o servidor não reentregue o lote.
+    """
+    results_payload = []
+    interval = heartbeat_interval(lease_seconds)
+    last_heartbeat = time.monotonic()
+    
+    for i, item_job in enumerate(items_to_price):
+        if lease_id and time.monotonic() - last_heartbeat >= interval:
+            last_heartbeat = time.monotonic()
+            if not send_heartbeat(lease_id):
+                print("Lease perdido: o lote foi entregue a outro worker. Interrompendo.")
+                break
+
+        print(f"  [{i+1}/{len(items_to_price)}] Buscando Buff ID: {item_job.get('buff_item_id')}...")
+        
+        result = record_result(price_item(item_job), lease_id, cny_brl_rate)
+        
+        if result:
+            results_payload.append(result)
+
+    return results_payload
+
+def is_rejected(response):
+    """4xx que não adianta reenviar (payload ou lease inválidos, credencial errada)."""
+    return 400 <= response.status_code < 500 and response.status_code not in (408, 429)
+
+def submit_work_batch(prices_payload, cny_brl_rate, lease_id=None):
+    """
+    Envia o lote de preços (em CNY) para o servidor Django, confirmando o lease.
+    Retorna True se o servidor recebeu o lote (e o marca como enviado no diário) ou se o
+    recusou de vez com um 4xx (os preços vão para o arquivo de recusados do diário).
+    Retorna False só em erros de rede e 5xx, que valem uma nova tentativa.
+    """
+    if not prices_payload and not lease_id:
+        return True
         
     url = f"{API_BASE_URL}/scanner/api/submit-item-batch/"
-    payload = json.dumps({
+    payload, headers = api_codec.encode_request({
         "prices": prices_payload,
-        "cny_brl_rate": str(cny_brl_rate) # Envia a taxa de volta para consistência
+        "cny_brl_rate": str(cny_brl_rate), # Envia a taxa de volta para consistência
+        "lease_id": lease_id # Mesmo sem preços, devolve os itens do lease para a fila
     })
     
     try:
-        response = requests.post(url, data=payload, headers=API_HEADERS, timeout=15)
+        response = api_client.post(url, data=payload, headers=headers)
+        if is_rejected(response):
+            print(f"Lote recusado pelo servidor ({response.status_code}): {response.text[:200]}")
+            if journal and prices_payload:
+                journal.quarantine(lease_id, cny_brl_rate, prices_payload, response.status_code)
+            return True
         response.raise_for_status()
-        print(f"Lote enviado com sucesso: {response.json()}")
-    except requests.RequestException as e:
+        print(f"Lote enviado com sucesso: {api_codec.decode_response(response)}")
+    except (requests.RequestException, PayloadError) as e:
         print(f"Erro ao enviar lote de trabalho: {e}")
+        return False
+    if journal:
+        journal.mark_submitted(lease_id, cny_brl_rate, [result["id"] for result in prices_payload])
+    return True
+
+def replay_journal(skip=()):
+    """
+    Reenvia os preços do diário que o servidor ainda não recebeu, menos os lotes em `skip`
+    (pares `(lease_id, cny_brl_rate)` ainda em andamento). Retorna False se algum envio falhou.
+    """
+    if not journal:
+        return True
+    ok = True
+    for lease_id, cny_brl_rate, results in journal.pending_batches():
+        if (lease_id, cny_brl_rate) in skip:
+            continue
+        print(f"Reenviando {len(results)} preço(s) pendente(s) do diário (lease {lease_id})...")
+        ok = submit_work_batch(results, cny_brl_rate, lease_id) and ok
+    return ok
 
 def main_loop():
     print("--- Worker de Precificação (Buff) Iniciado ---")
     print(f"Conectando ao servidor: {API_BASE_URL}")
 
     while True:
-        work_data = get_work_batch()
+        # Preços de execuções anteriores (ou de envios que falharam) vão antes de buscar mais
+        if not replay_journal():
+            print("Servidor indisponível para reenviar o diário. Tentando novamente em 60s.")
+            time.sleep(60)
+            continue
+
+        work_data = get_work_batch(WORKER_LONG_POLL)
         
         if not work_data:
             print("Falha ao obter trabalho. Tentando novamente em 60s.")
@@ -101,8 +281,11 @@ def main_loop():
         
         items_to_price = work_data.get("items_to_price", [])
         cny_brl_rate = work_data.get("cny_brl_rate")
+        lease_id = work_data.get("lease_id")
 
         if not items_to_price:
+            if WORKER_LONG_POLL:
+                continue # O servidor já esperou por trabalho; pergunta de novo
             print("Nenhum item novo para precificar.")
             break
             
@@ -112,36 +295,175 @@ def main_loop():
             continue
 
         print(f"Recebido lote de {len(items_to_price)} itens. Taxa CNY: {cny_brl_rate}")
-        results_payload = []
-        
-        for i, item_job in enumerate(items_to_price):
-            item_id = item_job.get("id")
-            buff_item_id = item_job.get("buff_item_id")
-            
-            print(f"  [{i+1}/{len(items_to_price)}] Buscando Buff ID: {buff_item_id}...")
-            
-            buff_data = call_buff_api(buff_item_id)
-            
-            if buff_data:
-                results_payload.append({
-                    "id": item_id,
-                    "price_cny": buff_data['price_cny'],
-                    "offers": buff_data['offers']
-                })
-            
-            # Pausa para não sobrecarregar a API do Buff
-            time.sleep(round(uniform(0, 2), 2))
+        results_payload = price_batch(items_to_price, lease_id, work_data.get("lease_seconds"), cny_brl_rate)
 
         # Envia os resultados do lote
-        submit_work_batch(results_payload, cny_brl_rate)
-        print("Lote concluído. Esperando próximo lote...", end=" ")
-        if uniform(0, 1) < 0.5:
-            wait_time = randint(900, 1800) # 15-30 minutos
-            time.sleep(wait_time)
-        else:
-            wait_time = randint(120, 300) # Cada worker executa um lote a cada 2-5 minutos
-            time.sleep(wait_time)
-        print(f"Aguardando {wait_time // 60} minutos...")
+        submit_work_batch(results_payload, cny_brl_rate, lease_id)
+        # O ritmo é ditado pelo limitador; o próximo lote começa em seguida
+        print(f"Lote concluído. Taxa atual do Buff: {buff_limiter.rate:.2f} req/s.")
+
+class PipelinedWorker:
+    """
+    Worker em asyncio que mantém vários lotes em andamento.
+
+    Um produtor busca o próximo lote enquanto os atuais são precificados (a fila guarda
+    um lote adiantado), `batches` consumidores precificam lotes em paralelo dividindo
+    `concurrency` chamadas simultâneas ao Buff, e os envios correm em segundo plano.
+    As chamadas HTTP continuam síncronas (HttpClient, limitador, orçamento compartilhado)
+    e rodam em threads. Ao receber SIGINT/SIGTERM, para de buscar lotes e de iniciar
+    novas chamadas, envia o que já foi precificado e devolve o resto dos leases.
+    """
+
+    def __init__(self, concurrency=WORKER_CONCURRENCY, batches=WORKER_BATCHES):
+        self.concurrency = concurrency
+        self.batches = batches
+        self.stopping = None
+        self.pending_submits = set()
+        # Lotes sendo precificados ou enviados: o diário já tem os preços deles, mas não são reenviados
+        self.in_flight = set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        # Uma thread por chamada ao Buff, mais as buscas, heartbeats e envios
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency + 2 * self.batches + 2))
+        self.stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass # Windows: Ctrl+C vira KeyboardInterrupt
+
+        print(f"--- Worker de Precificação (Buff) Iniciado em modo pipeline: {self.batches} lotes, {self.concurrency} chamadas simultâneas ---")
+        print(f"Conectando ao servidor: {API_BASE_URL}")
+        self.buff_slots = asyncio.Semaphore(self.concurrency)
+        queue = asyncio.Queue(maxsize=1)
+        consumers = [asyncio.create_task(self._consume(queue)) for _ in range(self.batches)]
+        try:
+            await self._produce(queue)
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+        finally:
+            self.stopping.set()
+            # Lotes buscados e não iniciados voltam para a fila do servidor
+            while not queue.empty():
+                work_data = queue.get_nowait()
+                if work_data:
+                    self._submit_in_background([], work_data)
+            if self.pending_submits:
+                print(f"Enviando {len(self.pending_submits)} lote(s) pendente(s)...")
+                await asyncio.gather(*self.pending_submits, return_exceptions=True)
+        print(f"Worker finalizado. Taxa atual do Buff: {buff_limiter.rate:.2f} req/s.")
+
+    def stop(self):
+        if not self.stopping.is_set():
+            print("Encerrando: terminando as chamadas em andamento e enviando os resultados...")
+            self.stopping.set()
+
+    async def _sleep(self, seconds):
+        """Espera que termina antes se o worker for encerrado."""
+        try:
+            await asyncio.wait_for(self.stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _produce(self, queue):
+        while not self.stopping.is_set():
+            # Preços de execuções anteriores (ou de envios que falharam) vão antes de buscar mais.
+            # O conjunto é passado vivo: um lote que um consumidor começa durante o replay também é pulado
+            if not await asyncio.to_thread(replay_journal, self.in_flight):
+                print("Servidor indisponível para reenviar o diário. Tentando novamente em 60s.")
+                await self._sleep(60)
+                continue
+            work_data = await asyncio.to_thread(get_work_batch, WORKER_LONG_POLL)
+            if not work_data:
+                print("Falha ao obter trabalho. Tentando novamente em 60s.")
+                await self._sleep(60)
+                continue
+            if not work_data.get("items_to_price"):
+                if WORKER_LONG_POLL:
+                    continue
+                print("Nenhum item novo para precificar.")
+                return
+            if not work_data.get("cny_brl_rate"):
+                print("Erro: API não retornou taxa de câmbio. Aguardando 60s.")
+                await self._sleep(60)
+                continue
+            await queue.put(work_data)
+
+    async def _consume(self, queue):
+        while True:
+            work_data = await queue.get()
+            if work_data is None:
+                return
+            self.in_flight.add(self._batch_key(work_data))
+            if self.stopping.is_set():
+                self._submit_in_background([], work_data)
+                continue
+            results_payload = await self._price_batch(work_data)
+            self._submit_in_background(results_payload, work_data)
+
+    async def _price_batch(self, work_data):
+        items_to_price = work_data["items_to_price"]
+        lease_id = work_data.get("lease_id")
+        lease_lost = asyncio.Event()
+        print(f"Recebido lote de {len(items_to_price)} itens. Taxa CNY: {work_data['cny_brl_rate']}")
+
+        async def price(item_job):
+            async with self.buff_slots:
+                if self.stopping.is_set() or lease_lost.is_set():
+                    return None
+                result = await asyncio.to_thread(price_item, item_job)
+                return await asyncio.to_thread(record_result, result, lease_id, work_data["cny_brl_rate"])
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(heartbeat_interval(work_data.get("lease_seconds")))
+                if not await asyncio.to_thread(send_heartbeat, lease_id):
+                    print("Lease perdido: o lote foi entregue a outro worker. Interrompendo.")
+                    lease_lost.set()
+                    return
+
+        heartbeat_task = asyncio.create_task(heartbeat()) if lease_id else None
+        try:
+            results = await asyncio.gather(*(price(item_job) for item_job in items_to_price))
+        finally:
+            if heartbeat_task:
+                heartbeat_task.cancel()
+        results_payload = [result for result in results if result]
+        print(f"Lote precificado: {len(results_payload)}/{len(items_to_price)} itens. Taxa atual do Buff: {buff_limiter.rate:.2f} req/s.")
+        return results_payload
+
+    @staticmethod
+    def _batch_key(work_data):
+        return (work_data.get("lease_id"), work_data.get("cny_brl_rate"))
+
+    def _submit_in_background(self, results_payload, work_data):
+        task = asyncio.create_task(asyncio.to_thread(
+            submit_work_batch, results_payload, work_data.get("cny_brl_rate"), work_data.get("lease_id")
+        ))
+        self.pending_submits.add(task)
+        task.add_done_callback(self.pending_submits.discard)
+        # Depois do envio (aceito ou não), o que sobrar no diário fica com o replay do produtor
+        task.add_done_callback(lambda _: self.in_flight.discard(self._batch_key(work_data)))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Worker de precificação do Buff.")
+    parser.add_argument("--pipelined", action="store_true", help="Usa o modo asyncio com vários lotes em andamento.")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Chamadas simultâneas ao Buff no modo pipeline.")
+    parser.add_argument("--batches", type=int, default=WORKER_BATCHES, help="Lotes em andamento ao mesmo tempo no modo pipeline.")
+    parser.add_argument("--max-rate", type=float, default=BUFF_MAX_RATE, help="Taxa máxima no Buff (req/s).")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main_loop()
\ No newline at end of file
+    args = parse_args()
+    buff_limiter.max_rate = args.max_rate
+    buff_limiter.rate = min(buff_limiter.rate, args.max_rate)
+    open_journal()
+    if args.pipelined:
+        try:
+            asyncio.run(PipelinedWorker(args.concurrency, args.batches).run())
+        except KeyboardInterrupt:
+            pass
+    else:
+        main_loop()
\ No newline at end of file
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0007_item_offers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('item_count', models.IntegerField(default=0)),
+                ('inserted', models.IntegerField(default=0)),
+                ('updated', models.IntegerField(default=0)),
+                ('deleted', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Scan Generation',
+                'verbose_name_plural': 'Scan Generations',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='scanneditem',
+            name='generation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='items', to='scanner.scangeneration'),
+        ),
+    ]
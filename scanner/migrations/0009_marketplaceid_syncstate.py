@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0008_scangeneration_scanneditem_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketplaceId',
+            fields=[
+                ('name', models.CharField(help_text='Nome normalizado (clear_item_name)', max_length=255, primary_key=True, serialize=False)),
+                ('market_hash_name', models.CharField(max_length=255)),
+                ('buff163_id', models.IntegerField(blank=True, null=True)),
+                ('youpin_id', models.IntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
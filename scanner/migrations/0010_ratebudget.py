@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0009_marketplaceid_syncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateBudget',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('rate', models.FloatField(help_text='Tokens repostos por segundo')),
+                ('capacity', models.FloatField(help_text='Máximo de tokens acumulados (rajada)')),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0010_ratebudget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='priority',
+            field=models.FloatField(db_index=True, default=0, help_text='Prioridade de precificação (maior primeiro), recalculada por rescore_pricing'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0011_item_priority'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingJob',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pricing_job', serialize=False, to='scanner.item')),
+                ('lease_id', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('leased_until', models.DateTimeField(db_index=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-16 20:01
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_names(apps, schema_editor):
+    """Mantém só a entrada mais recente de cada nome antes de criar a restrição única."""
+    BlackList = apps.get_model('scanner', 'BlackList')
+    duplicated = BlackList.objects.order_by().values('name').annotate(count=Count('id')).filter(count__gt=1).values_list('name', flat=True)
+    stale_ids = []
+    for name in duplicated:
+        ids = list(BlackList.objects.filter(name=name).order_by('-timestamp', '-id').values_list('id', flat=True))
+        stale_ids.extend(ids[1:])
+    for start in range(0, len(stale_ids), 500):
+        BlackList.objects.filter(id__in=stale_ids[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0012_pricingjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='blacklist',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
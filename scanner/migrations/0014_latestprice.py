@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-16 20:03
+
+from django.db import migrations, models
+
+
+def backfill_latest_prices(apps, schema_editor):
+    """Preenche a tabela com o preço mais recente de cada (nome, fonte) do histórico do Buff."""
+    ScannedItem = apps.get_model('scanner', 'ScannedItem')
+    LatestPrice = apps.get_model('scanner', 'LatestPrice')
+    rows = (
+        ScannedItem.objects.filter(source='buff')
+        .order_by('name', '-timestamp', '-id')
+        .values_list('name', 'source', 'price', 'offers', 'link', 'diff', 'timestamp')
+    )
+    batch = []
+    last_name = None
+    for name, source, price, offers, link, diff, timestamp in rows.iterator(chunk_size=2000):
+        if name == last_name:
+            continue
+        last_name = name
+        batch.append(LatestPrice(name=name, source=source, price=price, offers=offers, link=link, diff=diff, timestamp=timestamp))
+        if len(batch) >= 500:
+            LatestPrice.objects.bulk_create(batch)
+            batch = []
+    LatestPrice.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0013_blacklist_unique_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('source', models.CharField(max_length=50)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('offers', models.IntegerField(blank=True, null=True)),
+                ('link', models.URLField(blank=True, max_length=500, null=True)),
+                ('diff', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('timestamp', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Latest Price',
+                'verbose_name_plural': 'Latest Prices',
+                'constraints': [models.UniqueConstraint(fields=('name', 'source'), name='latestprice_name_source_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_latest_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-16 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0014_latestprice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('resolution', models.CharField(choices=[('hour', 'Hora'), ('day', 'Dia')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Início do intervalo')),
+                ('open', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('offers_min', models.IntegerField(blank=True, null=True)),
+                ('offers_max', models.IntegerField(blank=True, null=True)),
+                ('offers_close', models.IntegerField(blank=True, null=True)),
+                ('samples', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Price Rollup',
+                'verbose_name_plural': 'Price Rollups',
+                'indexes': [models.Index(fields=['resolution', 'bucket'], name='scanner_pri_resolut_2968e3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('name', 'resolution', 'bucket'), name='pricerollup_name_resolution_bucket_unique')],
+            },
+        ),
+    ]
@@ -1,5 +1,24 @@
 from django.db import models
 
+# Fontes dos marketplaces varridos pelo scanner (as linhas 'buff' são o histórico de referência)
+MARKETPLACE_SOURCES: list[str] = ['dash_bot', 'dash_p2p', 'brskins']
+
+class ScanGeneration(models.Model):
+    """Uma varredura completa dos marketplaces, aplicada como delta sobre a anterior."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    item_count = models.IntegerField(default=0)
+    inserted = models.IntegerField(default=0)
+    updated = models.IntegerField(default=0)
+    deleted = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Scan Generation"
+        verbose_name_plural = "Scan Generations"
+
+    def __str__(self):
+        return f"Generation {self.id} - {self.created_at}"
+
 class ScannedItem(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -8,6 +27,8 @@ class ScannedItem(models.Model):
     link = models.URLField(max_length=500, null=True, blank=True)
     diff = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     timestamp = models.DateTimeField(auto_now=True)
+    # Geração em que a linha de marketplace foi inserida ou alterada pela última vez (nulo para 'buff')
+    generation = models.ForeignKey(ScanGeneration, null=True, blank=True, on_delete=models.SET_NULL, related_name="items")
 
     class Meta:
         ordering = ['-timestamp']
@@ -17,8 +38,67 @@ class ScannedItem(models.Model):
     def __str__(self):
         return self.name
 
-class BlackList(models.Model):
+class LatestPrice(models.Model):
+    """
+    Preço mais recente de cada item por fonte, atualizado (upsert) na mesma transação em que
+    o preço é gravado no histórico de ScannedItem. As leituras de "preço atual" viram uma
+    busca pela chave (name, source) em vez de um DISTINCT ON sobre o histórico.
+    """
     name = models.CharField(max_length=255)
+    source = models.CharField(max_length=50)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    offers = models.IntegerField(null=True, blank=True)
+    link = models.URLField(max_length=500, null=True, blank=True)
+    # Para o Buff: o melhor diff entre os marketplaces em que o item aparece
+    diff = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    timestamp = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'source'], name='latestprice_name_source_unique'),
+        ]
+        verbose_name = "Latest Price"
+        verbose_name_plural = "Latest Prices"
+
+    def __str__(self):
+        return f"{self.name} ({self.source}): {self.price}"
+
+class PriceRollup(models.Model):
+    """
+    Agregado OHLC dos preços do Buff de um item numa hora ou num dia (UTC).
+    As linhas brutas de ScannedItem mais antigas que a retenção são resumidas aqui
+    pelo comando rollup_prices e depois apagadas.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    RESOLUTION_CHOICES = [(HOUR, 'Hora'), (DAY, 'Dia')]
+
+    name = models.CharField(max_length=255)
+    resolution = models.CharField(max_length=4, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField(help_text="Início do intervalo")
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    # Ofertas: mínimo, máximo e a última leitura do intervalo
+    offers_min = models.IntegerField(null=True, blank=True)
+    offers_max = models.IntegerField(null=True, blank=True)
+    offers_close = models.IntegerField(null=True, blank=True)
+    samples = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'resolution', 'bucket'], name='pricerollup_name_resolution_bucket_unique'),
+        ]
+        indexes = [models.Index(fields=['resolution', 'bucket'])]
+        verbose_name = "Price Rollup"
+        verbose_name_plural = "Price Rollups"
+
+    def __str__(self):
+        return f"{self.name} ({self.resolution} {self.bucket:%Y-%m-%d %H:%M}): {self.close}"
+
+class BlackList(models.Model):
+    name = models.CharField(max_length=255, unique=True)
     offers = models.IntegerField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now=True)
 
@@ -81,6 +161,54 @@ class Item(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     offers = models.IntegerField(null=True, blank=True)
     price_time = models.DateTimeField(null=True, blank=True, help_text="Última vez que o preço foi verificado", db_index=True)
+    priority = models.FloatField(default=0, db_index=True, help_text="Prioridade de precificação (maior primeiro), recalculada por rescore_pricing")
+
+    def __str__(self):
+        return self.name
+
+class PricingJob(models.Model):
+    """
+    Lease de um item entregue a um worker de precificação.
+
+    Enquanto `leased_until` não passa, o item não é entregue a outro worker. O worker
+    estende o prazo com heartbeats e confirma (ack) ao enviar os preços; um lease
+    expirado volta para a fila, contando mais uma tentativa.
+    """
+    item = models.OneToOneField(Item, primary_key=True, on_delete=models.CASCADE, related_name="pricing_job")
+    lease_id = models.UUIDField(null=True, blank=True, db_index=True)
+    leased_until = models.DateTimeField(db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.item_id} ({self.lease_id}, até {self.leased_until})"
+
+class MarketplaceId(models.Model):
+    """IDs de cada item nos marketplaces (buff163, youpin), indexados pelo nome normalizado."""
+    name = models.CharField(primary_key=True, max_length=255, help_text="Nome normalizado (clear_item_name)")
+    market_hash_name = models.CharField(max_length=255)
+    buff163_id = models.IntegerField(null=True, blank=True)
+    youpin_id = models.IntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.market_hash_name
+
+class SyncState(models.Model):
+    """Estado de uma sincronização periódica (ETag, checkpoints, contadores), identificado por uma chave."""
+    key = models.CharField(primary_key=True, max_length=100)
+    data = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} - {self.updated_at}"
+
+class RateBudget(models.Model):
+    """Token bucket compartilhado entre processos para as requisições a um upstream (ex.: 'buff')."""
+    name = models.CharField(primary_key=True, max_length=50)
+    rate = models.FloatField(help_text="Tokens repostos por segundo")
+    capacity = models.FloatField(help_text="Máximo de tokens acumulados (rajada)")
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField()
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.name}: {self.tokens:.1f}/{self.capacity:.0f} ({self.rate} req/s)"
@@ -0,0 +1,171 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ScannedItem
+
+# Particionamento mensal opcional (PostgreSQL) da tabela de ScannedItem, ativado com
+# `partition_scanned_items --convert`. Em outros bancos as funções são no-op.
+
+# Meses futuros mantidos criados à frente (além do mês atual)
+PARTITIONS_AHEAD = 3
+
+TABLE = ScannedItem._meta.db_table
+LEGACY_TABLE = f"{TABLE}_legacy"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def _month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def _partition_name(month):
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def _month_of(partition_name):
+    """Mês de uma partição pelo nome (None para a default ou nomes fora do padrão)."""
+    try:
+        return datetime.strptime(partition_name.removeprefix(f"{TABLE}_p"), "%Y_%m").replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        return None
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))", [TABLE])
+        return cursor.fetchone()[0]
+
+
+def _partitions(cursor):
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname",
+        [TABLE],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _create_partition(cursor, month):
+    quote = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote(_partition_name(month))} PARTITION OF {quote(TABLE)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [month, _next_month(month)],
+    )
+
+
+def ensure_partitions(ahead=PARTITIONS_AHEAD):
+    """Cria as partições do mês atual e dos `ahead` meses seguintes. Retorna quantas foram criadas."""
+    if not is_partitioned():
+        return 0
+    month = _month_start(timezone.now())
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing = set(_partitions(cursor))
+        created = 0
+        for _ in range(ahead + 1):
+            if _partition_name(month) not in existing:
+                _create_partition(cursor, month)
+                created += 1
+            month = _next_month(month)
+    return created
+
+
+@transaction.atomic
+def convert(ahead=PARTITIONS_AHEAD):
+    """
+    Converte a tabela comum em particionada, numa única transação (a tabela fica travada
+    durante a cópia: rodar numa janela de manutenção). A chave primária passa a ser
+    `(id, timestamp)`, exigência do PostgreSQL para tabelas particionadas; os demais índices
+    e chaves estrangeiras são recriados como estavam, mais um BRIN em `timestamp`.
+    Linhas fora das partições mensais caem numa partição default. Retorna o nº de linhas copiadas.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid) FROM pg_index "
+            "JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid "
+            "WHERE pg_index.indrelid = to_regclass(%s) AND NOT pg_index.indisprimary",
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(f"SELECT MIN({quote('timestamp')}) FROM {quote(TABLE)}")
+        oldest = cursor.fetchone()[0] or timezone.now()
+
+        # Os nomes de índices e constraints são do schema: saem da tabela antiga antes de serem recriados
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(LEGACY_TABLE)}")
+        for name, _ in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(LEGACY_TABLE)} DROP CONSTRAINT {quote(name)}")
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {quote(name)}")
+        cursor.execute(f"ALTER TABLE {quote(LEGACY_TABLE)} DROP CONSTRAINT {quote(f'{TABLE}_pkey')}")
+
+        cursor.execute(
+            f"CREATE TABLE {quote(TABLE)} (LIKE {quote(LEGACY_TABLE)} INCLUDING DEFAULTS INCLUDING IDENTITY "
+            f"INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE ({quote('timestamp')})"
+        )
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(f'{TABLE}_pkey')} PRIMARY KEY (id, {quote('timestamp')})")
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}")
+        # As definições apontam para o nome original, que agora é o da tabela particionada
+        for _, definition in indexes:
+            cursor.execute(definition)
+        cursor.execute(f"CREATE INDEX {quote(f'{TABLE}_timestamp_brin')} ON {quote(TABLE)} USING brin ({quote('timestamp')})")
+
+        month, last = _month_start(oldest), _month_start(timezone.now())
+        for _ in range(ahead):
+            last = _next_month(last)
+        while month <= last:
+            _create_partition(cursor, month)
+            month = _next_month(month)
+        cursor.execute(f"CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {quote(TABLE)} SELECT * FROM {quote(LEGACY_TABLE)}")
+        copied = cursor.rowcount
+        cursor.execute(f"DROP TABLE {quote(LEGACY_TABLE)}")
+
+        # A identidade da tabela nova continua de onde a antiga parou, com o nome de sequência de sempre
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {quote(TABLE)}), 0) + 1, false)", [sequence])
+        cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {quote(f'{TABLE}_id_seq')}")
+    return copied
+
+
+def drop_partitions_before(cutoff):
+    """
+    Remove (DETACH + DROP) as partições mensais que terminam antes de `cutoff` e só têm
+    linhas do Buff. Partições com ofertas de marketplace ainda ativas são mantidas (essas
+    linhas são a varredura atual, não histórico). Retorna as partições removidas.
+    """
+    if not is_partitioned():
+        return []
+    quote = connection.ops.quote_name
+    dropped = []
+    with connection.cursor() as cursor:
+        for name in _partitions(cursor):
+            month = _month_of(name)
+            if month is None or _next_month(month) > cutoff:
+                continue
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {quote(name)} WHERE source <> 'buff')")
+            if cursor.fetchone()[0]:
+                continue
+            with transaction.atomic():
+                cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}")
+                cursor.execute(f"DROP TABLE {quote(name)}")
+            dropped.append(name)
+    return dropped
@@ -0,0 +1,230 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import partitions
+from .ingest import ORM_BATCH_SIZE
+from .models import PriceRollup, ScannedItem, SyncState
+
+SYNC_KEY = "price_rollups"
+# Linhas mais novas que isso ainda podem estar em transações abertas: a hora só é resumida depois
+ROLLUP_LAG = timedelta(minutes=5)
+# Cada passo do rollup cobre no máximo este intervalo (uma transação e um checkpoint por passo)
+ROLLUP_STEP = timedelta(days=1)
+PRUNE_BATCH_SIZE = 5000
+# Até estes intervalos o histórico usa a resolução mais fina disponível; acima, hora e depois dia
+RAW_MAX_SPAN = timedelta(days=7)
+HOURLY_MAX_SPAN = timedelta(days=90)
+
+# Sentinelas para "desde sempre" / "nada resumido ainda"
+_MIN = datetime.min.replace(tzinfo=dt_timezone.utc)
+_MAX = datetime.max.replace(tzinfo=dt_timezone.utc)
+
+_ROLLUP_FIELDS = ['open', 'high', 'low', 'close', 'offers_min', 'offers_max', 'offers_close', 'samples']
+
+
+def _floor_hour(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(moment):
+    return _floor_hour(moment).replace(hour=0)
+
+
+def _load_state():
+    state, _ = SyncState.objects.get_or_create(key=SYNC_KEY)
+    return state
+
+
+def _checkpoint(state, key):
+    value = state.data.get(key)
+    return parse_datetime(value) if value else None
+
+
+def _min_offers(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max_offers(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _aggregate(points, bucket_of, resolution):
+    """
+    Junta pontos `(nome, momento, open, high, low, close, offers_min, offers_max, offers_close,
+    amostras)`, já ordenados por nome e momento, em um PriceRollup por (nome, intervalo).
+    """
+    rollups = {}
+    for name, moment, open_, high, low, close, offers_min, offers_max, offers_close, samples in points:
+        key = (name, bucket_of(moment))
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollups[key] = PriceRollup(
+                name=name, resolution=resolution, bucket=key[1], open=open_, high=high, low=low, close=close,
+                offers_min=offers_min, offers_max=offers_max, offers_close=offers_close, samples=samples,
+            )
+            continue
+        rollup.high = max(rollup.high, high)
+        rollup.low = min(rollup.low, low)
+        rollup.close = close
+        rollup.offers_min = _min_offers(rollup.offers_min, offers_min)
+        rollup.offers_max = _max_offers(rollup.offers_max, offers_max)
+        rollup.offers_close = offers_close
+        rollup.samples += samples
+    return list(rollups.values())
+
+
+def _raw_points(start, end):
+    rows = (
+        ScannedItem.objects.filter(source='buff', timestamp__gte=start, timestamp__lt=end)
+        .order_by('name', 'timestamp', 'id')
+        .values_list('name', 'timestamp', 'price', 'offers')
+    )
+    for name, moment, price, offers in rows.iterator(chunk_size=2000):
+        yield name, moment, price, price, price, price, offers, offers, offers, 1
+
+
+def _hourly_points(start, end):
+    rows = (
+        PriceRollup.objects.filter(resolution=PriceRollup.HOUR, bucket__gte=start, bucket__lt=end)
+        .order_by('name', 'bucket')
+        .values_list('name', 'bucket', *_ROLLUP_FIELDS)
+    )
+    return rows.iterator(chunk_size=2000)
+
+
+def _roll_up(state, key, resolution, start, end, floor, points):
+    """Resume [start, end) passo a passo, gravando o checkpoint na mesma transação de cada passo."""
+    written = 0
+    cursor = start
+    while cursor < end:
+        step_end = min(cursor + ROLLUP_STEP, end)
+        rollups = _aggregate(points(cursor, step_end), floor, resolution)
+        with transaction.atomic():
+            PriceRollup.objects.bulk_create(
+                rollups,
+                update_conflicts=True,
+                unique_fields=['name', 'resolution', 'bucket'],
+                update_fields=_ROLLUP_FIELDS,
+                batch_size=ORM_BATCH_SIZE,
+            )
+            state.data[key] = step_end.isoformat()
+            state.save()
+        written += len(rollups)
+        cursor = step_end
+    return written
+
+
+def roll_up(now=None):
+    """
+    Resume as horas completas do histórico bruto do Buff em agregados por hora e os dias
+    completos dos agregados por hora em agregados por dia, a partir dos checkpoints
+    salvos em SyncState. Pode ser interrompido e rodado de novo sem duplicar nada.
+    Retorna `(agregados por hora, agregados por dia)` gravados.
+    """
+    now = now or timezone.now()
+    state = _load_state()
+
+    hour_start = _checkpoint(state, 'hour')
+    if hour_start is None:
+        oldest = ScannedItem.objects.filter(source='buff').aggregate(oldest=Min('timestamp'))['oldest']
+        hour_start = _floor_hour(oldest) if oldest else None
+    hourly = 0
+    if hour_start is not None:
+        hourly = _roll_up(state, 'hour', PriceRollup.HOUR, hour_start, _floor_hour(now - ROLLUP_LAG), _floor_hour, _raw_points)
+
+    # Um dia só é resumido quando todas as suas horas já foram
+    day_start = _checkpoint(state, 'day')
+    if day_start is None:
+        oldest = PriceRollup.objects.filter(resolution=PriceRollup.HOUR).aggregate(oldest=Min('bucket'))['oldest']
+        day_start = _floor_day(oldest) if oldest else None
+    daily = 0
+    hour_checkpoint = _checkpoint(state, 'hour')
+    if day_start is not None and hour_checkpoint is not None:
+        daily = _roll_up(state, 'day', PriceRollup.DAY, day_start, _floor_day(hour_checkpoint), _floor_day, _hourly_points)
+    return hourly, daily
+
+
+def _delete_in_batches(queryset):
+    deleted = 0
+    while ids := list(queryset.values_list('id', flat=True)[:PRUNE_BATCH_SIZE]):
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+    return deleted
+
+
+def prune(now=None):
+    """
+    Apaga as linhas brutas do Buff mais antigas que SCANNER_RAW_RETENTION_DAYS e os agregados
+    por hora mais antigos que SCANNER_HOURLY_RETENTION_DAYS. Nada é apagado antes de ter sido
+    resumido (o corte nunca passa do checkpoint). Com a tabela particionada, os meses inteiros
+    antes do corte são removidos de uma vez (ver partitions.drop_partitions_before).
+    Retorna `(linhas brutas, agregados por hora, partições removidas)`.
+    """
+    now = now or timezone.now()
+    state = _load_state()
+    hour_checkpoint = _checkpoint(state, 'hour')
+    day_checkpoint = _checkpoint(state, 'day')
+
+    raw_deleted = hourly_deleted = 0
+    dropped = []
+    if hour_checkpoint is not None:
+        raw_cutoff = min(_floor_hour(now - timedelta(days=settings.SCANNER_RAW_RETENTION_DAYS)), hour_checkpoint)
+        dropped = partitions.drop_partitions_before(raw_cutoff)
+        raw_deleted = _delete_in_batches(ScannedItem.objects.filter(source='buff', timestamp__lt=raw_cutoff).order_by())
+        state.data['raw_from'] = max(raw_cutoff, _checkpoint(state, 'raw_from') or _MIN).isoformat()
+    if day_checkpoint is not None:
+        hourly_cutoff = min(_floor_day(now - timedelta(days=settings.SCANNER_HOURLY_RETENTION_DAYS)), day_checkpoint)
+        hourly_deleted = _delete_in_batches(
+            PriceRollup.objects.filter(resolution=PriceRollup.HOUR, bucket__lt=hourly_cutoff).order_by()
+        )
+        state.data['hour_from'] = max(hourly_cutoff, _checkpoint(state, 'hour_from') or _MIN).isoformat()
+    state.save()
+    return raw_deleted, hourly_deleted, dropped
+
+
+def _segments(resolution, state):
+    """
+    Divide a linha do tempo em trechos `(fonte, início, fim)` sem sobreposição. A resolução
+    pedida é usada onde existe; o passado mais antigo que ela cai para uma mais grossa e o
+    trecho recente ainda não resumido, para a mais fina.
+    """
+    raw_from = _checkpoint(state, 'raw_from') or _MIN
+    hour_from = _checkpoint(state, 'hour_from') or _MIN
+    hour_checkpoint = _checkpoint(state, 'hour') or _MIN
+    day_checkpoint = _checkpoint(state, 'day') or _MIN
+    if resolution == 'raw':
+        return [(PriceRollup.DAY, _MIN, hour_from), (PriceRollup.HOUR, hour_from, raw_from), ('raw', raw_from, _MAX)]
+    if resolution == PriceRollup.HOUR:
+        return [(PriceRollup.DAY, _MIN, hour_from), (PriceRollup.HOUR, hour_from, hour_checkpoint), ('raw', hour_checkpoint, _MAX)]
+    return [(PriceRollup.DAY, _MIN, day_checkpoint), (PriceRollup.HOUR, day_checkpoint, hour_checkpoint), ('raw', hour_checkpoint, _MAX)]
+
+
+def price_series(name, start, end):
+    """
+    Preços do Buff de um item entre `start` e `end`, como `[(momento, preço)]` em ordem.
+
+    A resolução depende do intervalo pedido (bruta até RAW_MAX_SPAN, por hora até
+    HOURLY_MAX_SPAN, por dia acima disso), e cada trecho é lido de onde os dados ainda
+    existem: agregados para o passado já resumido e linhas brutas para o resto. Nos
+    agregados, o ponto é o fechamento do intervalo.
+    """
+    span = end - start
+    resolution = 'raw' if span <= RAW_MAX_SPAN else PriceRollup.HOUR if span <= HOURLY_MAX_SPAN else PriceRollup.DAY
+    state = SyncState.objects.filter(key=SYNC_KEY).first() or SyncState(key=SYNC_KEY)
+
+    points = []
+    for source, segment_start, segment_end in _segments(resolution, state):
+        lower, upper = max(start, segment_start), min(end, segment_end)
+        if lower > upper:
+            continue
+        if source == 'raw':
+            rows = ScannedItem.objects.filter(name=name, source='buff', timestamp__gte=lower, timestamp__lte=upper)
+            points.extend(rows.order_by('timestamp').values_list('timestamp', 'price'))
+        else:
+            rows = PriceRollup.objects.filter(name=name, resolution=source, bucket__gte=lower, bucket__lt=upper)
+            points.extend(rows.order_by('bucket').values_list('bucket', 'close'))
+    return points
@@ -0,0 +1,184 @@
+import math
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+
+from trades.models import Trade
+
+from .ingest import bulk_update_rows
+from .models import Item, LatestPrice, PricingJob, ScannedItem
+
+# Um preço é considerado fresco por este tempo; depois disso a urgência cresce linearmente
+FRESHNESS = timedelta(hours=8)
+# Teto da urgência por idade (um item nunca precificado conta como o mais atrasado)
+MAX_STALENESS = 6.0
+# Janela de preços do Buff usada para medir a volatilidade
+VOLATILITY_WINDOW = timedelta(days=7)
+# Peso da volatilidade: uma oscilação de 10% na janela vale +1 no peso do item
+VOLATILITY_WEIGHT = 10.0
+# Mudanças menores que isso não são regravadas no rescore
+PRIORITY_TOLERANCE = 0.01
+
+# Prazo de um lease; o worker o estende com heartbeats enquanto trabalha
+LEASE_DURATION = timedelta(minutes=5)
+# Um item precificado só volta para a fila depois deste intervalo
+REPRICE_AFTER = timedelta(hours=6)
+# Leases expirados seguidos antes de o item ficar de fora até REPRICE_AFTER
+MAX_ATTEMPTS = 3
+
+
+def score(age, held_value=0, holders=0, volatility=0):
+    """
+    Prioridade de precificação de um item: urgência × peso.
+
+    - urgência: idade do último preço em múltiplos de FRESHNESS, limitada a MAX_STALENESS
+      (`age=None` = nunca precificado);
+    - peso: 1 + log(valor em carteira) + log(nº de donos) + volatilidade recente.
+
+    O log evita que um único item caro monopolize o orçamento do Buff.
+    """
+    staleness = MAX_STALENESS if age is None else min(age / FRESHNESS, MAX_STALENESS)
+    weight = 1 + math.log1p(float(held_value)) + math.log1p(holders) + VOLATILITY_WEIGHT * volatility
+    return round(staleness * weight, 4)
+
+
+def portfolio_exposure():
+    """`{item_name: (valor em carteira, nº de donos)}` dos trades em aberto (valor a preço de compra)."""
+    rows = (
+        Trade.objects.filter(sell_price__isnull=True)
+        .values('item_name')
+        .annotate(value=Sum('buy_price'), holders=Count('owner', distinct=True))
+    )
+    return {row['item_name']: (row['value'], row['holders']) for row in rows}
+
+
+def price_volatility(names=None):
+    """`{nome: (máx - mín) / média}` dos preços do Buff dentro de VOLATILITY_WINDOW."""
+    queryset = ScannedItem.objects.filter(source='buff', timestamp__gte=timezone.now() - VOLATILITY_WINDOW)
+    if names is not None:
+        queryset = queryset.filter(name__in=names)
+    rows = queryset.values('name').annotate(high=Max('price'), low=Min('price'), mean=Avg('price'))
+    return {
+        row['name']: float((row['high'] - row['low']) / row['mean'])
+        for row in rows if row['mean']
+    }
+
+
+def rescore_items():
+    """
+    Recalcula `Item.priority` de todo o catálogo e grava só o que mudou.
+    Retorna quantos itens tiveram a prioridade alterada.
+    """
+    now = timezone.now()
+    exposure = portfolio_exposure()
+    volatility = price_volatility()
+
+    changed = []
+    for item in Item.objects.only('id', 'market_hash_name', 'price_time', 'priority').iterator(chunk_size=2000):
+        held_value, holders = exposure.get(item.market_hash_name, (0, 0))
+        age = now - item.price_time if item.price_time else None
+        priority = score(age, held_value, holders, volatility.get(item.market_hash_name, 0))
+        if abs(priority - item.priority) >= PRIORITY_TOLERANCE:
+            item.priority = priority
+            changed.append(item)
+
+    return bulk_update_rows(changed, ['priority'])
+
+
+def portfolio_items_to_price(limit=100):
+    """Nomes dos itens em carteira sem preço do Buff recente, do mais para o menos prioritário."""
+    now = timezone.now()
+    exposure = portfolio_exposure()
+    last_priced = dict(
+        LatestPrice.objects.filter(source='buff', name__in=list(exposure)).values_list('name', 'timestamp')
+    )
+    volatility = price_volatility(list(exposure))
+
+    scored = []
+    for name, (held_value, holders) in exposure.items():
+        last = last_priced.get(name)
+        if last and now - last < FRESHNESS:
+            continue
+        age = now - last if last else None
+        scored.append((score(age, held_value, holders, volatility.get(name, 0)), name))
+
+    scored.sort(reverse=True)
+    return [name for _, name in scored[:limit]]
+
+
+def _items_needing_price():
+    """Itens precificados há mais de REPRICE_AFTER (ou nunca) e sem lease ativo."""
+    now = timezone.now()
+    not_leased = (
+        Q(pricing_job__isnull=True)
+        | Q(pricing_job__leased_until__lte=now, pricing_job__attempts__lt=MAX_ATTEMPTS)
+        | Q(pricing_job__leased_until__lte=now - REPRICE_AFTER)
+    )
+    return Item.objects.filter(Q(price_time__isnull=True) | Q(price_time__lte=now - REPRICE_AFTER)).filter(not_leased)
+
+
+def has_items_to_price():
+    """Consulta barata (sem travas) usada pelo long-poll de get-item-batch."""
+    return _items_needing_price().exists()
+
+
+def claim_items_for_pricing(limit=100):
+    """
+    Trava (SKIP LOCKED) os `limit` itens de maior prioridade que precisam de preço e não
+    estão com nenhum worker. Deve rodar dentro de uma transação, seguida de `grant_lease`.
+    """
+    return list(
+        _items_needing_price()
+        .order_by(F('priority').desc(), F('price_time').asc(nulls_first=True))
+        .select_for_update(skip_locked=True, of=('self',))[:limit]
+    )
+
+
+def grant_lease(item_ids):
+    """Entrega os itens (já travados) a um novo lease. Retorna `(lease_id, leased_until)`."""
+    lease_id = uuid.uuid4()
+    leased_until = timezone.now() + LEASE_DURATION
+    previous_attempts = dict(PricingJob.objects.filter(item_id__in=item_ids).values_list('item_id', 'attempts'))
+    jobs = [
+        PricingJob(
+            item_id=item_id,
+            lease_id=lease_id,
+            leased_until=leased_until,
+            # Um item que ficou de fora por MAX_ATTEMPTS recomeça a contagem
+            attempts=previous_attempts.get(item_id, 0) % MAX_ATTEMPTS + 1,
+        )
+        for item_id in item_ids
+    ]
+    PricingJob.objects.bulk_create(
+        jobs, update_conflicts=True, unique_fields=['item'], update_fields=['lease_id', 'leased_until', 'attempts']
+    )
+    return lease_id, leased_until
+
+
+def extend_lease(lease_id):
+    """Heartbeat: estende o prazo dos itens que ainda pertencem ao lease. Retorna `(itens, leased_until)`."""
+    leased_until = timezone.now() + LEASE_DURATION
+    extended = PricingJob.objects.filter(lease_id=lease_id).update(leased_until=leased_until)
+    return extended, leased_until
+
+
+@transaction.atomic
+def acknowledge_lease(lease_id, priced_ids):
+    """
+    Confirma os itens precificados (removendo os jobs) e devolve os demais itens do lease
+    para a fila. Retorna os ids cujo preço deve ser aceito: os do próprio lease e os que
+    não estão com nenhum outro worker (ex.: reenvio de um lease já expirado, ou um worker
+    antigo que não manda `lease_id`).
+    """
+    priced_ids = set(priced_ids)
+    busy = PricingJob.objects.select_for_update().filter(item_id__in=priced_ids, leased_until__gt=timezone.now())
+    if lease_id is not None:
+        busy = busy.exclude(lease_id=lease_id)
+        # O que o worker não conseguiu precificar volta para a fila na hora
+        PricingJob.objects.filter(lease_id=lease_id).exclude(item_id__in=priced_ids).update(lease_id=None, leased_until=timezone.now())
+    accepted = priced_ids - set(busy.values_list('item_id', flat=True))
+    PricingJob.objects.filter(item_id__in=accepted).delete()
+    return accepted
@@ -1,83 +1,39 @@
-import requests
-import time
 import sys
+from scanner.services import markets
+from scanner.services.markets import MarketSource, Offer, register
 
 # Change the encoding to UTF-8 because of the special characters in the skin names
 sys.stdout.reconfigure(encoding='utf-8')
 
-remove = [
-    "Souvenir",
-    "Sticker",
-    "PP-Bizon",
-    "P-90",
-    "MAG-7",
-    "XM1014",
-    "Negev",
-    "M249"
-]
+@register
+class BRSkins(MarketSource):
+    name = 'brskins'
+    label = 'BR Skins'
+    first_page = 0
+    sorted_by_discount = True
 
-def get_items(products, min, max, limit=10000):
+    def page_url(self, min_price, max_price, page):
+        return f"https://brskins.gg/api/marketdata/get-market-offers?price_from={min_price}&price_to={max_price}&order_by=BestDiscount&pageIndex={page}"
 
-    brskins_url = f"https://brskins.gg/api/marketdata/get-market-offers?price_from={min}&price_to={max}&order_by=BestDiscount&pageIndex={'{}'}"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.1 Safari/537.36",}
-    response = requests.get(brskins_url.format(0), headers = headers)
-
-    if response.status_code != 200:
-        erro+=1
-        print(f"Erro na requisição para brskins: {response.status_code}")
-        print(f"Erro: {response.text}")
-        return products
-
-    data = response.json()
-
-    item_counter = 0
-    erro = 0
-    for page in range(0, 4): # Max 500 items (100 items per page)
-        
-        if item_counter > limit:
-            break
-        
-        retry = 0
-        while retry <= 3:
-            try:
-                data = requests.get(brskins_url.format(page), headers=headers).json()
-                break
-            except:
-                data = {}
-                retry+=1
-                time.sleep(2)
-        if erro > 5:
-            print(f"Too many errors ({erro})... Exiting")
-            return products
-        elif not data:
-            erro += 1
-            print(f"Error on page {page}")
-            continue
+    def next_page_urls(self, first_data, min_price, max_price):
+        # Max 500 items (100 items per page)
+        return [self.page_url(min_price, max_price, page) for page in range(1, 4)]
 
+    def parse(self, data):
         for item in data['offers']:
-            if item_counter > limit:
-                break
-
             product = item['product']
             market_hash_name = product['productCode']
             id = item['id']
             link = f"https://brskins.gg/market/item/{id}"
             price = float(item.get('price', 1e05))
+            yield Offer(market_hash_name, price, self.name, link, id, item.get('discount'))
 
-            if any(substring in market_hash_name for substring in remove):
-                continue
-
-            if market_hash_name in products and price >= products[market_hash_name].get('price', 0):
-                continue
-
-            products[market_hash_name] = {'price': price, 'source': 'brskins', 'link': link}
-            item_counter += 1
-
-    print(f"* BR Skins parse concluded. {item_counter} item's analyzed")
-    return products
+def get_items(products, min, max, limit=10000, pool=None, thresholds=None):
+    source = markets.get_source(BRSkins.name)
+    return markets.collect(source.offers(min, max, pool, thresholds), products, limit, source.label)
 
 if __name__ == "__main__":
     products = {}
     products = get_items(products, 20, 350, 150)
     for name, info in products.items():
-        print(f"{name}: {info}")
\ No newline at end of file
+        print(f"{name}: {info}")
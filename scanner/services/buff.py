@@ -1,6 +1,10 @@
-import requests
 import time
-from scanner.services import utils
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.db import connection
+from scanner.services import http_client, id_registry, rate_budget
+from scanner.services.utils import clear_item_name
 from trades.utils import _get_exchange_rate
 
 headers = {
@@ -13,56 +17,100 @@ headers = {
 cookie_str = "Device-Id=28CBbwnyKELAN2J6UbTx; Locale-Supported=en; game=csgo; session=1-kyXFZC70bdEZgqe7QuuZtVIOv2Bs-7DMTNTEi0Y5a-M12036662111; csrf_token=ImQ0ZDc1YmM2MzczMmFjMTZjMjA3MmYyODM2YjI1YjQyZmQ5NzFjMDQi.aIuwrQ.humrQaT8-MJCassXfoi6-2l9NxI"
 cookies = {c.strip().split("=", 1)[0]: c.strip().split("=", 1)[1] for c in cookie_str.split(";")}
 
-def get_skin_data(item_id, cnybrl):
+# Buff calls get no automatic retries and no circuit breaker: every 429 has to reach the
+# limiter (and be charged to the budget), which is what slows the calls down
+buff_client = http_client.HttpClient(retries=0, failure_threshold=None, headers=headers)
+
+def get_skin_data(item_id, cnybrl, limiter=None):
 
     buff_api_url = f"https://buff.163.com/api/market/goods/sell_order?game=csgo&page_num=1&goods_id={item_id}"
     link = f"https://buff.163.com/goods/{item_id}"
 
-    while True:
-        try:
-            # Send a GET request to the API
-            response = requests.get(buff_api_url, headers=headers)#, cookies=cookies)
-            response.raise_for_status()  # Raise an exception for bad responses (non-2xx status codes)
-
-            # Parse the JSON response
-            data = response.json()
-
-            # Extract the "items" list
-            items_list = data.get("data", {}).get("items", [])
-
-            if items_list:
-                # If the list is not empty, extract the "price" value from the first item
-                buff_price = items_list[0].get("price")
-                buff_price = float(buff_price) * float(cnybrl)
-                buff_offers = data.get("data", {}).get("total_count", 0)
-                break  # Exit the loop if successful
-            else:
-                #print(f"'{product_name}' price information not found in the response")
-                buff_price = 0
-                buff_offers = 0
-                break
-
-        except requests.RequestException as e:
-            None
-            #warning(f"An error occurred: {str(e)}\n{product_name} fetch failed...")
-
-        # Sleep before retrying
-        time.sleep(0.5)
+    response = None
+    try:
+        # The optional limiter paces the calls and adapts its rate to what Buff answers
+        if limiter is not None:
+            limiter.acquire()
+        start = time.monotonic()
+        # Send a GET request to the API (a single attempt; the limiter decides when to try again)
+        response = buff_client.get(buff_api_url)#, cookies=cookies)
+        if limiter is not None:
+            limiter.record(status=response.status_code, latency=time.monotonic() - start)
+        response.raise_for_status()  # Raise an exception for bad responses (non-2xx status codes)
+
+        # Parse the JSON response
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        if limiter is not None and response is None:
+            limiter.record(error=True)
+        print(f"An error occurred while fetching buff item {item_id}: {e}")
+        return None
+
+    # Extract the "items" list
+    items_list = data.get("data", {}).get("items", [])
+
+    if items_list:
+        # If the list is not empty, extract the "price" value from the first item
+        buff_price = items_list[0].get("price")
+        buff_price = float(buff_price) * float(cnybrl)
+        buff_offers = data.get("data", {}).get("total_count", 0)
+    else:
+        #print(f"'{product_name}' price information not found in the response")
+        buff_price = 0
+        buff_offers = 0
 
     buff_price = round(buff_price, 2)
 
     return {'price': buff_price, 'offers': buff_offers, 'source': 'buff', 'link': link}
 
-def get_item_info(item):
-
-    cleared_name = utils.clear_item_name(item)
+def get_item_info(item, priority=rate_budget.INTERACTIVE):
 
+    # Called from web requests: serve the stored rate and revalidate it in the background,
+    # never wait for the provider here (only the batch commands do, in get_items_info)
     cnybrl = _get_exchange_rate("CNY")
+    if cnybrl is None:
+        return None
 
-    id_dict = utils.load_id_dict()
-    item_id = id_dict.get(cleared_name)
-
+    item_id = id_registry.get_buff_id(item)
     if item_id:
-        return get_skin_data(item_id, cnybrl)
-
-    return None
\ No newline at end of file
+        # Single lookups come from the web (a trade being added), so they get the top priority
+        return get_skin_data(item_id, cnybrl, rate_budget.SharedBudgetLimiter(priority))
+
+    return None
+
+
+def _get_skin_data_in_thread(item_id, cnybrl, limiter):
+    # The shared budget opens a DB connection in each executor thread; close it when the
+    # task ends so threads don't leave connections behind once the pool is gone
+    try:
+        return get_skin_data(item_id, cnybrl, limiter)
+    finally:
+        connection.close()
+
+
+def get_items_info(items, max_workers=4, limiter=None):
+    """
+    Fetches Buff prices for many items with at most `max_workers` requests in flight.
+
+    The exchange rate and the id registry are resolved once for the whole batch.
+    Yields `(item, info)` as each request completes; `info` is None when the item
+    has no Buff id or the request failed.
+    """
+    # Batch commands can afford to wait for the provider when no rate was ever stored
+    cnybrl = _get_exchange_rate("CNY", wait=True)
+    buff_ids = id_registry.buff_ids() if cnybrl is not None else {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="buff")
+    try:
+        futures = {}
+        for item in items:
+            item_id = buff_ids.get(clear_item_name(item))
+            if item_id:
+                futures[executor.submit(_get_skin_data_in_thread, item_id, cnybrl, limiter)] = item
+            else:
+                yield item, None
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # If the consumer stops early, pending requests are dropped instead of awaited
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,155 @@
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+# Dependências opcionais: sem elas a API continua funcionando em JSON + gzip
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Corpos menores que isso não compensam o custo de compressão
+MIN_COMPRESS_SIZE = 1024
+
+
+class PayloadError(ValueError):
+    """Corpo da requisição ilegível (compressão, msgpack ou JSON inválidos)."""
+
+
+def _default(obj):
+    # Mesmo contrato do DecimalEncoder / DjangoJSONEncoder: decimais viram string
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def available_formats():
+    return [MSGPACK, JSON] if msgpack else [JSON]
+
+
+def available_encodings():
+    return ["zstd", "gzip"] if zstandard else ["gzip"]
+
+
+def dumps(data, content_type=JSON):
+    if content_type == MSGPACK:
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+    return json.dumps(data, default=_default).encode("utf-8")
+
+
+def loads(raw, content_type=JSON):
+    try:
+        if content_type == MSGPACK:
+            if msgpack is None:
+                raise PayloadError("msgpack is not installed")
+            return msgpack.unpackb(raw, raw=False)
+        return json.loads(raw) if raw else {}
+    except PayloadError:
+        raise
+    except Exception as e:
+        raise PayloadError(f"Invalid {content_type} body: {e}") from e
+
+
+def compress(raw, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(raw)
+    if encoding == "gzip":
+        return gzip.compress(raw, compresslevel=5)
+    return raw
+
+
+def decompress(raw, encoding):
+    try:
+        if encoding == "zstd":
+            if zstandard is None:
+                raise PayloadError("zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+        if encoding == "gzip":
+            return gzip.decompress(raw)
+    except PayloadError:
+        raise
+    except Exception as e:
+        raise PayloadError(f"Invalid {encoding} body: {e}") from e
+    if encoding and encoding != "identity":
+        raise PayloadError(f"Unsupported Content-Encoding: {encoding}")
+    return raw
+
+
+def encode(data, content_type=JSON, encoding=None):
+    """Serializa e (se valer a pena) comprime. Retorna `(corpo, headers)`."""
+    body = dumps(data, content_type)
+    headers = {"Content-Type": content_type}
+    if encoding and len(body) >= MIN_COMPRESS_SIZE:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def decode(raw, content_type=None, encoding=None):
+    content_type = (content_type or JSON).split(";")[0].strip().lower()
+    encoding = (encoding or "").strip().lower() or None
+    return loads(decompress(raw, encoding), MSGPACK if content_type == MSGPACK else JSON)
+
+
+def _tokens(header):
+    """Itens de um cabeçalho Accept/Accept-Encoding, sem os recusados (q=0)."""
+    tokens = []
+    for part in (header or "").split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        if token and not any(param.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000") for param in params):
+            tokens.append(token.lower())
+    return tokens
+
+
+def negotiate(accept, accept_encoding):
+    """Escolhe `(content_type, encoding)` da resposta a partir dos cabeçalhos do cliente."""
+    accepted_types = _tokens(accept)
+    content_type = MSGPACK if msgpack and MSGPACK in accepted_types else JSON
+    accepted_encodings = _tokens(accept_encoding)
+    encoding = next((candidate for candidate in available_encodings() if candidate in accepted_encodings), None)
+    return content_type, encoding
+
+
+class ApiCodec:
+    """
+    Lado cliente da negociação com a API do scanner.
+
+    Começa em JSON sem compressão. Depois da primeira resposta, passa a enviar os corpos
+    no formato que o servidor respondeu (msgpack se ele suportar) e comprimidos com o
+    melhor algoritmo listado no `Accept-Encoding` da resposta (o que o servidor sabe
+    descomprimir). A descompressão das respostas fica com o requests/urllib3.
+    """
+
+    def __init__(self):
+        self.request_type = JSON
+        self.request_encoding = None
+
+    def request_headers(self):
+        accept = f"{MSGPACK}, {JSON};q=0.9" if msgpack else JSON
+        return {"Accept": accept}
+
+    def encode_request(self, data):
+        return encode(data, self.request_type, self.request_encoding)
+
+    def decode_response(self, response):
+        self.observe(response)
+        content_type = response.headers.get("Content-Type", JSON)
+        return decode(response.content, content_type)
+
+    def observe(self, response):
+        server_encodings = _tokens(response.headers.get("Accept-Encoding"))
+        if server_encodings:
+            self.request_encoding = next((candidate for candidate in available_encodings() if candidate in server_encodings), None)
+        if msgpack and response.headers.get("Content-Type", "").startswith(MSGPACK):
+            self.request_type = MSGPACK
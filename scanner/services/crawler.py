@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from scanner.services import markets
+
+
+class PagePool:
+    """
+    Pool de threads compartilhado entre os scanners para buscar páginas em paralelo.
+
+    Limita o número de requisições simultâneas por host (`max_per_host`) para não
+    sermos bloqueados pelos marketplaces, mesmo quando várias fontes ou faixas de
+    preço do mesmo site são varridas ao mesmo tempo.
+    """
+
+    def __init__(self, max_per_host=4, max_workers=16):
+        self.max_per_host = max(1, max_per_host)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crawler")
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def _run(self, fetch, url, *args):
+        with self._slot(url):
+            return fetch(url, *args)
+
+    def map(self, fetch, urls, *args):
+        """
+        Equivalente a `map(fetch, urls)`, mas com até `max_per_host` páginas em voo.
+
+        Os resultados são entregues na ordem das URLs. Se o consumidor parar de iterar
+        (ex.: atingiu o limite de itens), as páginas ainda não iniciadas são canceladas.
+        """
+        urls = iter(urls)
+        in_flight = deque()
+        try:
+            for url in urls:
+                in_flight.append(self._executor.submit(self._run, fetch, url, *args))
+                if len(in_flight) >= self.max_per_host:
+                    break
+            while in_flight:
+                result = in_flight.popleft().result()
+                next_url = next(urls, None)
+                if next_url is not None:
+                    in_flight.append(self._executor.submit(self._run, fetch, next_url, *args))
+                yield result
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def price_bands(min_price, max_price, bands=1):
+    """
+    Divide `[min_price, max_price]` em `bands` faixas com espaçamento geométrico.
+
+    Há muito mais ofertas baratas do que caras, então faixas geométricas ficam com
+    volumes parecidos e evitam páginas profundas (lentas e limitadas pela API remota).
+    """
+    bands = max(1, int(bands))
+    if bands == 1 or min_price <= 0 or max_price <= min_price:
+        return [(min_price, max_price)]
+    ratio = (max_price / min_price) ** (1 / bands)
+    edges = [round(min_price * ratio ** step, 2) for step in range(bands)] + [max_price]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def jobs_from_profiles(profiles):
+    """Converte os perfis de varredura (ver `SCANNER_SCAN_PROFILES`) em jobs para `crawl`, uma por faixa."""
+    jobs = []
+    for profile in profiles:
+        for min_price, max_price in price_bands(profile['min_price'], profile['max_price'], profile.get('bands', 1)):
+            jobs.append((profile['source'], min_price, max_price, profile.get('limit', 10000)))
+    return jobs
+
+
+def crawl(jobs, max_per_host=4, thresholds=None):
+    """
+    Executa os scanners em paralelo e retorna o mesmo dicionário `products` da versão sequencial.
+
+    `jobs` é uma lista de tuplas `(fonte, min, max, limit)`, onde `fonte` é o nome de um
+    `MarketSource` registrado. Cada fonte roda na sua própria thread e busca suas páginas
+    pelo `PagePool`, então o tempo total fica próximo ao da fonte mais lenta em vez da
+    soma de todas as requisições. `thresholds` (um `ScanThresholds`) ativa a parada
+    antecipada nos feeds ordenados por desconto.
+    """
+    if not jobs:
+        return {}
+
+    pool = PagePool(max_per_host=max_per_host, max_workers=min(64, max_per_host * len(jobs)))
+    start = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="source") as executor:
+            futures = []
+            for name, min_price, max_price, limit in jobs:
+                source = markets.get_source(name)
+                offers = source.offers(min_price, max_price, pool, thresholds)
+                futures.append(executor.submit(markets.collect, offers, {}, limit, source.label))
+            results = [future.result() for future in futures]
+    finally:
+        pool.shutdown()
+
+    # A mescla segue a ordem dos jobs, igual à execução sequencial
+    products = {}
+    for result in results:
+        markets.merge(products, result)
+
+    print(f"* Concurrent crawl concluded in {time.monotonic() - start:.1f}s. {len(products)} item's collected")
+    return products
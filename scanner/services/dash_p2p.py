@@ -1,55 +1,33 @@
-import requests
-
-remove = [
-    "Souvenir",
-    "Sticker",
-    "PP-Bizon",
-    "P-90",
-    "MAG-7",
-    "XM1014",
-    "Negev",
-    "M249"
-]
-
-def get_items(products, min, max, limit=10000):
+from scanner.services import markets
+from scanner.services.markets import MarketSource, Offer, register
+
+@register
+class DashP2P(MarketSource):
+    name = 'dash_p2p'
+    label = 'P2P DashSkins'
+    # O feed vem ordenado por desconto, mas numa única página (sem next_page_urls): a parada
+    # antecipada não economiza requisições aqui, só no BR Skins, que pagina
+    sorted_by_discount = True
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
 
-    dash_p2p_url = f"https://api.dashskins.gg/v1/item?pageSize=500&maxPriceBRL={max}&minPriceBRL={min}&sort=discount-desc"
-
-    response = requests.get(dash_p2p_url, headers=headers, timeout=15)
-    if response.status_code != 200:
-        print(f"Erro na requisição para dash_p2p: {response.status_code}")
-        print(f"Erro: {response.text}")
-        return products
-    data = response.json()
+    def page_url(self, min_price, max_price, page):
+        # A API P2P retorna até 500 itens numa única página
+        return f"https://api.dashskins.gg/v1/item?pageSize=500&maxPriceBRL={max_price}&minPriceBRL={min_price}&sort=discount-desc"
 
-    dash_p2p_items = data.get("page", [])
-
-    item_counter = 0
-
-    if dash_p2p_items:
-        for item in dash_p2p_items:
-            if item_counter > limit:
-                break
+    def parse(self, data):
+        for item in data.get("page", []):
             name = item.get("marketHashName")
             id = item.get("id")
-            link_name = name.replace(" ", "-").replace("|", "").replace("(", "").replace(")", "").lower()
-            link = f"https://dashskins.gg/item/{link_name}/{id}"
             price = item.get("priceBRL")
-
-            if any(substring in name for substring in remove):
-                continue
-
-            #Check if the item qualifies for the items list
-            if name in products and price >= products[name].get('price', 0):
-                # Skip this item as it's more expensive than the one already seen
+            # Anúncio incompleto: sem nome ou preço não há o que comparar
+            if name is None or price is None:
                 continue
-            
-            # Add/Update the item on the dictionary of viewed items
-            products[name] = {'price': price, 'source': 'dash_p2p', 'link': link}
-            item_counter += 1
+            link_name = name.replace(" ", "-").replace("|", "").replace("(", "").replace(")", "").lower()
+            link = f"https://dashskins.gg/item/{link_name}/{id}"
+            yield Offer(name, float(price), self.name, link, id, item.get("discount"))
 
-    print(f"* P2P DashSkins parse concluded. {len(dash_p2p_items)} item's analyzed")
-    return products
\ No newline at end of file
+def get_items(products, min, max, limit=10000, pool=None, thresholds=None):
+    source = markets.get_source(DashP2P.name)
+    return markets.collect(source.offers(min, max, pool, thresholds), products, limit, source.label)
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) em segundos. Nenhuma chamada externa deve ficar pendurada para sempre.
+DEFAULT_TIMEOUT = (5, 15)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Quando definido, todas as chamadas são redirecionadas para este servidor (ex.: o simulador
+# offline usado por `benchmark_scanner`). O host original segue no cabeçalho X-Upstream-Host.
+_upstream_override = os.environ.get("SCANNER_HTTP_OVERRIDE")
+
+
+def set_upstream_override(base_url):
+    global _upstream_override
+    _upstream_override = base_url.rstrip("/") if base_url else None
+
+
+def upstream_override_active():
+    """Indica se as URLs estão sendo redirecionadas para um upstream simulado (ver set_upstream_override)."""
+    return bool(_upstream_override)
+
+
+def _apply_override(url, kwargs):
+    if not _upstream_override:
+        return url
+    parts = urlsplit(url)
+    kwargs["headers"] = {**(kwargs.get("headers") or {}), "X-Upstream-Host": parts.netloc}
+    return f"{_upstream_override}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+class CircuitOpenError(requests.RequestException):
+    """Disparada quando o host está com o circuito aberto após falhas consecutivas."""
+
+
+class CircuitBreaker:
+    """
+    Circuito simples por host: após `failure_threshold` falhas seguidas, recusa
+    chamadas por `reset_timeout` segundos e depois libera uma tentativa de teste.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_request(self, host):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit open for {host} after {self.failures} consecutive failures")
+            # Meio-aberto: deixa passar uma tentativa; se falhar, o circuito reabre
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    """
+    Cliente HTTP com uma `requests.Session` (keep-alive) por host, timeout padrão,
+    tentativas com backoff exponencial limitado e circuit breaker por host.
+
+    Apenas métodos idempotentes (GET, HEAD, ...) são repetidos automaticamente.
+    Com `failure_threshold=None` o circuit breaker fica desligado (ex.: o Buff, em que os
+    429 são tratados por um limitador adaptativo e não devem bloquear as chamadas).
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=3, backoff_factor=0.5, pool_maxsize=10,
+                 failure_threshold=5, reset_timeout=60, headers=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_maxsize = pool_maxsize
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.headers = headers or {}
+        self._sessions = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _retry(self):
+        return Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            backoff_max=30,
+            status_forcelist=RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+
+    def _session(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                session.headers.update(self.headers)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=self._retry())
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def _breaker(self, host):
+        if self.failure_threshold is None:
+            return None
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def request(self, method, url, **kwargs):
+        # O circuito é sempre do host original, mesmo quando a chamada é redirecionada
+        upstream_host = urlsplit(url).netloc
+        breaker = self._breaker(upstream_host)
+        if breaker is not None:
+            breaker.before_request(upstream_host)
+        url = _apply_override(url, kwargs)
+        session = self._session(urlsplit(url).netloc)
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        if breaker is None:
+            return response
+        if response.status_code in RETRY_STATUSES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._breakers.clear()
+
+
+# Cliente padrão do processo, compartilhado por todos os serviços
+client = HttpClient()
+
+
+def get(url, **kwargs):
+    return client.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return client.post(url, **kwargs)
@@ -0,0 +1,164 @@
+import hashlib
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.db import connection, transaction
+from django.utils import timezone
+
+from scanner.models import MarketplaceId, SyncState
+from scanner.services import http_client
+from scanner.services.utils import clear_item_name
+
+IDS_URL = "https://raw.githubusercontent.com/ModestSerhat/cs2-marketplace-ids/main/cs2_marketplaceids.json"
+SYNC_KEY = "marketplace_ids"
+
+# De quanto em quanto tempo (s) o processo confere se o registro no banco mudou
+CHECK_INTERVAL = 600
+# Idade máxima do registro antes de revalidar no GitHub (requisição condicional)
+REFRESH_INTERVAL = timedelta(hours=6)
+
+_lock = threading.Lock()
+_buff_ids = None
+_version = None
+_checked_at = 0.0
+_refreshing = False
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_buff_id(name):
+    """ID do item no buff163 a partir do nome (qualquer formatação), ou None."""
+    return buff_ids().get(clear_item_name(name))
+
+
+def buff_ids():
+    """
+    Dicionário `nome normalizado -> buff163 id` mantido em memória.
+
+    Nunca baixa nada no caminho da requisição: a primeira chamada do processo só lê o
+    banco, e a cada CHECK_INTERVAL uma thread em segundo plano revalida o registro no
+    GitHub (se passou de REFRESH_INTERVAL) e troca o dicionário se houver uma versão nova.
+    Enquanto o registro estiver vazio retorna {} (a primeira carga fica com essa thread
+    ou com o `refresh_marketplace_ids` agendado).
+    """
+    global _refreshing
+    if _buff_ids is None:
+        with _lock:
+            if _buff_ids is None:
+                _load(SyncState.objects.filter(key=SYNC_KEY).first())
+
+    start_refresh = False
+    with _lock:
+        if not _refreshing and time.monotonic() - _checked_at > CHECK_INTERVAL:
+            _refreshing = start_refresh = True
+    if start_refresh:
+        threading.Thread(target=_background_sync, name="id-registry-refresh", daemon=True).start()
+    return _buff_ids or {}
+
+
+def _load(state):
+    global _buff_ids, _version
+    version = state.data.get("version") if state else None
+    if _buff_ids is not None and version == _version:
+        return
+    loaded = dict(MarketplaceId.objects.filter(buff163_id__isnull=False).values_list('name', 'buff163_id'))
+    # Registro vazio: não guarda um dicionário vazio, para a próxima chamada ler o banco de novo
+    if loaded:
+        _buff_ids = loaded
+        _version = version
+
+
+def _background_sync():
+    global _refreshing, _checked_at
+    try:
+        state = SyncState.objects.filter(key=SYNC_KEY).first()
+        if state is None or state.updated_at < timezone.now() - REFRESH_INTERVAL:
+            try:
+                state = refresh()
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"An error occurred while refreshing marketplace ids: {e}")
+        with _lock:
+            _load(state)
+    except Exception as e:
+        print(f"An error occurred while syncing marketplace ids: {e}")
+    finally:
+        _checked_at = time.monotonic()
+        _refreshing = False
+        connection.close()
+
+
+def refresh(force=False):
+    """
+    Revalida o dicionário de IDs no GitHub com If-None-Match / If-Modified-Since.
+
+    Em 304 apenas marca o registro como conferido. Em 200 grava somente as linhas
+    novas ou alteradas e remove as que sumiram. Retorna o SyncState atualizado.
+
+    Com o upstream simulado ativo (benchmark_scanner) o arquivo é baixado e comparado,
+    mas nada é gravado: o SyncState retornado não é salvo.
+    """
+    simulated = http_client.upstream_override_active()
+    state = SyncState.objects.filter(key=SYNC_KEY).first() or SyncState(key=SYNC_KEY)
+    headers = {}
+    if not force and MarketplaceId.objects.exists():
+        if state.data.get("etag"):
+            headers["If-None-Match"] = state.data["etag"]
+        if state.data.get("last_modified"):
+            headers["If-Modified-Since"] = state.data["last_modified"]
+
+    # O arquivo tem alguns MB, então o timeout de leitura é maior
+    response = http_client.get(IDS_URL, headers=headers, timeout=(5, 60))
+    if response.status_code == 304:
+        state.data["not_modified"] = True
+        if not simulated:
+            state.save()
+        return state
+    response.raise_for_status()
+
+    incoming = {}
+    for market_hash_name, ids in response.json()['items'].items():
+        incoming[clear_item_name(market_hash_name)] = MarketplaceId(
+            name=clear_item_name(market_hash_name),
+            market_hash_name=market_hash_name,
+            buff163_id=_as_int(ids.get('buff163_goods_id')),
+            youpin_id=_as_int(ids.get('youpin_id')),
+        )
+
+    existing = {
+        name: (market_hash_name, buff163_id, youpin_id)
+        for name, market_hash_name, buff163_id, youpin_id
+        in MarketplaceId.objects.values_list('name', 'market_hash_name', 'buff163_id', 'youpin_id')
+    }
+    changed = [
+        row for name, row in incoming.items()
+        if existing.get(name) != (row.market_hash_name, row.buff163_id, row.youpin_id)
+    ]
+    removed = [name for name in existing if name not in incoming]
+    state.data = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "version": response.headers.get("ETag") or hashlib.sha1(response.content).hexdigest(),
+        "items": len(incoming),
+        "changed": len(changed),
+        "removed": len(removed),
+        "not_modified": False,
+    }
+    if simulated:
+        return state
+
+    with transaction.atomic():
+        MarketplaceId.objects.bulk_create(
+            changed, batch_size=1000, update_conflicts=True, unique_fields=['name'],
+            update_fields=['market_hash_name', 'buff163_id', 'youpin_id', 'updated_at'],
+        )
+        for start in range(0, len(removed), 500):
+            MarketplaceId.objects.filter(name__in=removed[start:start + 500]).delete()
+        state.save()
+    return state
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+# Com esta quantidade de linhas já enviadas no arquivo, ele é reescrito só com as pendentes
+COMPACT_AFTER = 1000
+
+
+class ResultJournal:
+    """
+    Diário local, só de acréscimo (JSON lines), dos preços buscados por um worker.
+
+    Cada preço é gravado (com fsync) assim que chega do Buff, e cada envio aceito pelo
+    servidor grava uma marca com os ids enviados. Se o worker cair ou o envio falhar, os
+    preços sem marca são reenviados na próxima execução em vez de buscados de novo.
+    O servidor ignora preços repetidos (ver `priced_at` em submit-item-batch), então
+    reenviar algo que já tinha sido aceito não tem efeito.
+
+    Preços que o servidor recusa de vez (4xx) vão para `<diário>.rejected` em vez de
+    ficarem sendo reenviados para sempre.
+
+    Uma linha truncada por uma queda no meio da escrita é ignorada na leitura.
+    Não depende do Django: é usado pelo worker.py rodando como script.
+    """
+
+    def __init__(self, path, compact_after=COMPACT_AFTER):
+        self.path = Path(path)
+        self.rejected_path = self.path.with_name(self.path.name + ".rejected")
+        self.compact_after = compact_after
+        self.pending = {} # (lease_id, cny_brl_rate) -> {item_id: resultado}
+        self.submitted_lines = 0
+        self._lock = threading.Lock()
+        truncated = self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self.submitted_lines or truncated:
+            self._compact()
+
+    def _replay(self):
+        """Carrega os preços pendentes do arquivo. Retorna True se a última linha estava truncada."""
+        if not self.path.exists():
+            return False
+        text = self.path.read_text(encoding="utf-8")
+        for line in text.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            key = (entry.get("lease_id"), entry.get("cny_brl_rate"))
+            if entry.get("op") == "result":
+                self.pending.setdefault(key, {})[entry["result"]["id"]] = entry["result"]
+            elif entry.get("op") == "submitted":
+                self._forget(key, entry.get("ids", []))
+                self.submitted_lines += 1
+        return bool(text) and not text.endswith("\n")
+
+    def _forget(self, key, item_ids):
+        results = self.pending.get(key, {})
+        for item_id in item_ids:
+            results.pop(item_id, None)
+        if not results:
+            self.pending.pop(key, None)
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, lease_id, cny_brl_rate, result):
+        """Grava um preço buscado (antes de qualquer tentativa de envio)."""
+        with self._lock:
+            self._write({"op": "result", "lease_id": lease_id, "cny_brl_rate": cny_brl_rate, "result": result})
+            self.pending.setdefault((lease_id, cny_brl_rate), {})[result["id"]] = result
+
+    def mark_submitted(self, lease_id, cny_brl_rate, item_ids):
+        """Registra que o servidor recebeu estes preços."""
+        if not item_ids:
+            return
+        with self._lock:
+            self._write({"op": "submitted", "lease_id": lease_id, "cny_brl_rate": cny_brl_rate, "ids": list(item_ids)})
+            self._forget((lease_id, cny_brl_rate), item_ids)
+            self.submitted_lines += 1
+            if self.submitted_lines >= self.compact_after:
+                self._compact()
+
+    def quarantine(self, lease_id, cny_brl_rate, results, reason):
+        """Guarda em `rejected_path` preços recusados pelo servidor e os tira dos pendentes."""
+        with self._lock:
+            with open(self.rejected_path, "a", encoding="utf-8") as rejected_file:
+                rejected_file.write(json.dumps({
+                    "lease_id": lease_id, "cny_brl_rate": cny_brl_rate, "reason": reason, "results": results,
+                }) + "\n")
+                rejected_file.flush()
+                os.fsync(rejected_file.fileno())
+        self.mark_submitted(lease_id, cny_brl_rate, [result["id"] for result in results])
+
+    def pending_batches(self):
+        """Lotes ainda não enviados: lista de `(lease_id, cny_brl_rate, resultados)`."""
+        with self._lock:
+            return [(lease_id, rate, list(results.values())) for (lease_id, rate), results in self.pending.items()]
+
+    def _compact(self):
+        """Reescreve o diário só com os preços pendentes (troca atômica do arquivo)."""
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as temp_file:
+            for (lease_id, rate), results in self.pending.items():
+                for result in results.values():
+                    temp_file.write(json.dumps({"op": "result", "lease_id": lease_id, "cny_brl_rate": rate, "result": result}) + "\n")
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.submitted_lines = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,224 @@
+import importlib
+from dataclasses import dataclass
+
+import requests
+
+from scanner.services import http_client
+
+# Itens ignorados por todos os scanners
+remove = [
+    "Souvenir",
+    "Sticker",
+    "PP-Bizon",
+    "P-90",
+    "MAG-7",
+    "XM1014",
+    "Negev",
+    "M249"
+]
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.1 Safari/537.36",
+}
+
+# Módulos que registram fontes. Para adicionar um marketplace (ex.: CSFloat, Skinport, Youpin),
+# crie um módulo com uma subclasse de `MarketSource` decorada com `@register` e inclua-o aqui.
+SOURCE_MODULES = [
+    "scanner.services.dash_p2p",
+    "scanner.services.dash_bot",
+    "scanner.services.br_skins",
+]
+
+_registry = {}
+
+
+@dataclass(frozen=True)
+class Offer:
+    """Oferta normalizada de um marketplace."""
+    name: str
+    price: float
+    source: str
+    link: str
+    listing_id: str | None = None
+    discount: float | None = None
+
+    def as_product(self):
+        return {'price': self.price, 'source': self.source, 'link': self.link}
+
+
+@dataclass
+class ScanThresholds:
+    """
+    Limiares para encerrar cedo a paginação de feeds ordenados por desconto.
+
+    Uma oferta é promissora se o desconto informado pelo marketplace (em %) é de pelo
+    menos `min_discount` e se `preço de referência (Buff) / preço` é de pelo menos
+    `min_reference_ratio`. Ofertas sem desconto ou sem preço de referência conhecido
+    contam como promissoras, pois não há como descartá-las.
+    """
+    min_discount: float | None = None
+    min_reference_ratio: float | None = None
+    reference_prices: dict | None = None
+
+    @property
+    def active(self):
+        return self.min_discount is not None or (self.min_reference_ratio is not None and bool(self.reference_prices))
+
+    def is_promising(self, offer):
+        if self.min_discount is not None and offer.discount is not None and offer.discount < self.min_discount:
+            return False
+        if self.min_reference_ratio is not None and self.reference_prices and offer.price:
+            reference = self.reference_prices.get(offer.name)
+            if reference and reference / offer.price < self.min_reference_ratio:
+                return False
+        return True
+
+
+class MarketSource:
+    """
+    Adaptador base para um marketplace.
+
+    Subclasses informam como montar a URL de cada página (`page_url`), quais páginas
+    buscar depois da primeira (`next_page_urls`) e como converter o JSON de uma página
+    em ofertas (`parse`). A paginação, as tentativas e o filtro `remove` ficam aqui.
+    """
+    name = None
+    label = None
+    headers = DEFAULT_HEADERS
+    first_page = 0
+    max_errors = 5
+    # Feeds ordenados por desconto decrescente podem parar de paginar quando os limiares não são mais atingidos
+    sorted_by_discount = False
+
+    def page_url(self, min_price, max_price, page):
+        raise NotImplementedError
+
+    def next_page_urls(self, first_data, min_price, max_price):
+        return []
+
+    def parse(self, data):
+        raise NotImplementedError
+
+    def fetch_first(self, url):
+        # Uma falha aqui (rede, circuito aberto, status != 200, JSON inválido) só descarta esta
+        # fonte/faixa, sem derrubar os resultados das demais no crawl concorrente
+        try:
+            response = http_client.get(url, headers=self.headers)
+            if response.status_code != 200:
+                print(f"Erro na requisição para {self.name}: {response.status_code}")
+                print(f"Erro: {response.text}")
+                return None
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Erro na requisição para {self.name}: {e}")
+            return None
+
+    def fetch(self, url):
+        # As tentativas com backoff ficam a cargo do http_client; uma página que falhou vem
+        # vazia e é contada como erro em `offers`
+        data = self.fetch_first(url)
+        return {} if data is None else data
+
+    def pages(self, min_price, max_price, pool=None, max_pages=None):
+        """
+        Gera o JSON de cada página. Com um `PagePool`, as páginas são buscadas em paralelo.
+        `max_pages` limita quantas páginas são buscadas, contando a primeira.
+        """
+        fetch_map = pool.map if pool else map
+        first_data = next(fetch_map(self.fetch_first, [self.page_url(min_price, max_price, self.first_page)]))
+        if first_data is None:
+            return
+        yield first_data
+        try:
+            next_urls = self.next_page_urls(first_data, min_price, max_price)
+        except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+            print(f"Resposta inesperada de {self.name} na primeira página: {e}")
+            return
+        if max_pages is not None:
+            next_urls = next_urls[:max(0, max_pages - 1)]
+        yield from fetch_map(self.fetch, next_urls)
+
+    def offers(self, min_price, max_price, pool=None, thresholds=None, max_pages=None):
+        """
+        Gera as ofertas da fonte sob demanda, já sem os itens da lista `remove`.
+
+        Com `thresholds` ativos e um feed ordenado por desconto, a paginação termina na
+        primeira página em que nenhuma oferta é promissora.
+        """
+        early_stop = thresholds if self.sorted_by_discount and thresholds and thresholds.active else None
+        errors = 0
+        for page, data in enumerate(self.pages(min_price, max_price, pool, max_pages), start=self.first_page):
+            if errors > self.max_errors:
+                print(f"Too many errors ({errors})... Exiting")
+                return
+            elif not data:
+                errors += 1
+                print(f"Error on page {page}")
+                continue
+
+            promising = False
+            try:
+                for offer in self.parse(data):
+                    if any(substring in offer.name for substring in remove):
+                        continue
+                    if early_stop and early_stop.is_promising(offer):
+                        promising = True
+                    yield offer
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                # Página fora do formato esperado (campo ausente ou nulo): conta como erro e segue
+                errors += 1
+                print(f"Error parsing page {page}: {e}")
+                continue
+
+            if early_stop and not promising:
+                print(f"* {self.label}: no offer above the thresholds on page {page}, stopping early")
+                return
+
+
+def register(cls):
+    """Decorador que registra uma subclasse de `MarketSource` pelo seu `name`."""
+    _registry[cls.name] = cls()
+    return cls
+
+
+def get_source(name):
+    if name not in _registry:
+        for module in SOURCE_MODULES:
+            importlib.import_module(module)
+    return _registry[name]
+
+
+def keep_cheapest(products, name, info):
+    """Mantém em `products` apenas a oferta mais barata de cada item. Retorna True se `info` entrou."""
+    if name in products and info['price'] >= products[name].get('price', 0):
+        return False
+    products[name] = info
+    return True
+
+
+def merge(products, new_products):
+    for name, info in new_products.items():
+        keep_cheapest(products, name, info)
+    return products
+
+
+def collect(offers, products=None, limit=10000, label=None):
+    """
+    Consome um gerador de ofertas e reduz para a oferta mais barata por `market_hash_name`.
+
+    Para de consumir (e portanto de buscar páginas) quando mais de `limit` ofertas forem aceitas.
+    """
+    products = {} if products is None else products
+    item_counter = 0
+    for offer in offers:
+        if item_counter > limit:
+            break
+        if keep_cheapest(products, offer.name, offer.as_product()):
+            item_counter += 1
+    # Fecha o gerador para cancelar as páginas que ainda estavam na fila do pool
+    if hasattr(offers, 'close'):
+        offers.close()
+
+    if label:
+        print(f"* {label} parse concluded. {item_counter} item's analyzed")
+    return products
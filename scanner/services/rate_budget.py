@@ -0,0 +1,102 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from scanner.models import RateBudget
+
+BUFF = "buff"
+
+INTERACTIVE = "interactive"
+PORTFOLIO = "portfolio"
+CATALOGUE = "catalogue"
+
+# Fração da capacidade que cada prioridade precisa deixar no balde para as de cima:
+# a web (interativa) pode usar tudo, a precificação do portfólio deixa 20% e o
+# catálogo (scanner, poller, workers) só consome a metade de cima do balde.
+PRIORITY_RESERVES = {
+    INTERACTIVE: 0.0,
+    PORTFOLIO: 0.2,
+    CATALOGUE: 0.5,
+}
+
+
+def _locked_budget(name):
+    budget = RateBudget.objects.select_for_update().filter(name=name).first()
+    if budget is None:
+        RateBudget.objects.get_or_create(name=name, defaults={
+            "rate": settings.SCANNER_BUFF_RATE,
+            "capacity": settings.SCANNER_BUFF_BURST,
+            "tokens": settings.SCANNER_BUFF_BURST,
+            "updated_at": timezone.now(),
+        })
+        budget = RateBudget.objects.select_for_update().get(name=name)
+    return budget
+
+
+def try_acquire(priority, tokens=1, name=BUFF):
+    """
+    Tenta retirar até `tokens` do orçamento compartilhado, numa transação com a linha travada.
+    Retorna `(concedidos, retry_after)`: quantos tokens foram concedidos (pode ser menos que o
+    pedido) e, se nenhum, em quantos segundos vale tentar de novo.
+    """
+    with transaction.atomic():
+        budget = _locked_budget(name)
+        now = timezone.now()
+        elapsed = max(0.0, (now - budget.updated_at).total_seconds())
+        budget.tokens = min(budget.capacity, budget.tokens + elapsed * budget.rate)
+        budget.updated_at = now
+
+        reserve = PRIORITY_RESERVES[priority] * budget.capacity
+        granted = max(0, min(tokens, int(budget.tokens - reserve)))
+        budget.tokens -= granted
+        budget.save(update_fields=["tokens", "updated_at"])
+
+    retry_after = 0.0 if granted else (reserve + 1 - budget.tokens) / budget.rate
+    return granted, retry_after
+
+
+def acquire(priority, name=BUFF, timeout=None):
+    """Espera até conseguir um token. Retorna False se `timeout` (s) se esgotar antes."""
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    while True:
+        granted, retry_after = try_acquire(priority, 1, name)
+        if granted:
+            return True
+        if deadline is not None and time.monotonic() + retry_after > deadline:
+            return False
+        time.sleep(min(retry_after, 5))
+
+
+def drain(name=BUFF):
+    """Esvazia o balde após um 429: todos os processos esperam a reposição antes de voltar."""
+    with transaction.atomic():
+        budget = _locked_budget(name)
+        budget.tokens = min(budget.tokens, 0.0)
+        budget.updated_at = timezone.now()
+        budget.save(update_fields=["tokens", "updated_at"])
+
+
+class SharedBudgetLimiter:
+    """
+    Limitador com a mesma interface do AdaptiveRateLimiter (acquire/record) que retira cada
+    token do orçamento compartilhado, com a prioridade do chamador. Um limitador local
+    opcional continua ajustando o ritmo deste processo por AIMD.
+    """
+
+    def __init__(self, priority, local=None, name=BUFF):
+        self.priority = priority
+        self.local = local
+        self.name = name
+
+    def acquire(self):
+        if self.local is not None:
+            self.local.acquire()
+        acquire(self.priority, self.name)
+
+    def record(self, status=None, **kwargs):
+        if self.local is not None:
+            self.local.record(status=status, **kwargs)
+        if status == 429:
+            drain(self.name)
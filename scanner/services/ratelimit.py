@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque
+
+# Respostas que indicam que o upstream está sobrecarregado ou limitando a gente
+CONGESTION_STATUSES = (429, 503)
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket com taxa ajustada por AIMD (aumento aditivo, redução multiplicativa).
+
+    - Cada sucesso aumenta a taxa em cerca de `increase` req/s a cada segundo.
+    - Um 429/503, uma taxa de erros acima de `error_threshold` na janela recente ou uma
+      latência acima de `latency_target` multiplicam a taxa por `decrease`. Depois de
+      uma redução, novos sinais são ignorados por um intervalo, para que as respostas que
+      já estavam em voo não derrubem a taxa várias vezes seguidas.
+    - Um `Retry-After` pausa a emissão de tokens até o prazo pedido pelo servidor.
+    - O tamanho do balde acompanha a taxa (cerca de 1 s de tokens, limitado a `burst`), para
+      que uma taxa reduzida não continue liberando rajadas do tamanho da taxa antiga.
+
+    Não depende do Django: é usado pelo worker.py rodando como script.
+    """
+
+    def __init__(self, rate=1.0, min_rate=0.2, max_rate=10.0, burst=None, increase=0.25, decrease=0.5,
+                 latency_target=None, error_threshold=0.3, window=20):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.max_burst = burst or max_rate
+        self.burst = self._burst_for(self.rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.outcomes = deque(maxlen=window)
+        self.tokens = 1.0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _burst_for(self, rate):
+        return min(self.max_burst, max(1.0, rate))
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível. Retorna quanto tempo (s) esperou."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def record(self, status=None, latency=None, error=False, retry_after=None):
+        """Registra o resultado de uma chamada e ajusta a taxa."""
+        congested = error or status in CONGESTION_STATUSES or (status is not None and status >= 500)
+        with self._lock:
+            now = time.monotonic()
+            self.outcomes.append(congested)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+            slow = self.latency_target is not None and latency is not None and latency > self.latency_target
+            error_rate = sum(self.outcomes) / len(self.outcomes)
+            if status in CONGESTION_STATUSES or slow or (congested and error_rate > self.error_threshold):
+                self._decrease(now)
+            elif not congested:
+                # ~`increase` req/s a mais por segundo, já que chegam ~`rate` sucessos por segundo
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+                self.burst = self._burst_for(self.rate)
+
+    def _decrease(self, now):
+        if now - self.last_decrease < max(1.0, 1 / self.rate):
+            return
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.burst = self._burst_for(self.rate)
+        self.tokens = min(self.tokens, 1.0)
+        self.last_decrease = now
+
+
+class GrantPool:
+    """
+    Tokens de um orçamento remoto (ex.: o orçamento compartilhado do Buff no servidor),
+    pedidos em lotes para não gastar uma ida ao servidor a cada chamada.
+
+    `request_grant(tokens, throttled)` deve retornar `(concedidos, retry_after)`.
+    """
+
+    def __init__(self, request_grant, batch=5):
+        self.request_grant = request_grant
+        self.batch = batch
+        self.available = 0
+        self.throttled = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if self.available > 0:
+                    self.available -= 1
+                    return
+                granted, retry_after = self.request_grant(self.batch, self.throttled)
+                self.throttled = False
+                self.available += granted
+            if not granted:
+                time.sleep(min(retry_after or 1, 5))
+
+    def report_throttled(self):
+        """Descarta os tokens em mãos e avisa o orçamento remoto no próximo pedido."""
+        with self._lock:
+            self.available = 0
+            self.throttled = True
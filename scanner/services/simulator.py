@@ -0,0 +1,271 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from scanner.services import codecs
+from scanner.services.utils import clear_item_name
+
+CNY_BRL_RATE = 0.78
+ID_DICT_ETAG = '"simulated-ids-v1"'
+
+
+@dataclass
+class SimulatorConfig:
+    """Parâmetros do simulador. Latências em milissegundos, taxas entre 0 e 1."""
+    latency_ms: float = 80
+    jitter_ms: float = 40
+    pages: int = 5
+    items_per_page: int = 60
+    throttle_rate: float = 0.0
+    error_rate: float = 0.0
+    batch_size: int = 20
+    worker_batches: int = 1
+    seed: int = 42
+    fixtures_dir: str | None = None
+
+
+class MarketSimulator:
+    """
+    Servidor HTTP local que imita dashskins, brskins, buff.163.com, open.er-api.com,
+    o dicionário de IDs do GitHub e a própria API do scanner.
+
+    Use junto com `http_client.set_upstream_override(simulator.base_url)`: o cliente
+    reescreve todas as URLs para este servidor e envia o host original em X-Upstream-Host,
+    que é usado aqui para escolher a rota. Respostas gravadas podem ser colocadas em
+    `fixtures_dir/<rota>.json` (ex.: `buff.json`) para substituir as sintéticas.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or SimulatorConfig()
+        self.catalogue = [
+            f"AK-47 | Simulated {index:05d} (Field-Tested)"
+            for index in range(self.config.pages * self.config.items_per_page)
+        ]
+        self.ids = {clear_item_name(name): index + 1 for index, name in enumerate(self.catalogue)}
+        self.counts = Counter()
+        self.received = Counter()
+        self.scanned_names = []
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config.seed)
+        self._fixtures = self._load_fixtures()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="market-simulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+            self.received.clear()
+
+    def _load_fixtures(self):
+        fixtures = {}
+        if self.config.fixtures_dir:
+            for path in Path(self.config.fixtures_dir).glob("*.json"):
+                fixtures[path.stem] = json.loads(path.read_text(encoding="utf-8"))
+        return fixtures
+
+    def _chance(self, rate):
+        with self._lock:
+            return self._random.random() < rate
+
+    def _price(self, index):
+        return round(25 + (index * 37) % 300 + (index % 7) * 0.13, 2)
+
+    def _discount(self, index):
+        # Feeds ordenados por desconto decrescente
+        return round(max(0.0, 30 - index * 0.1), 1)
+
+    # --- Rotas dos marketplaces ---
+
+    def _dash_bot(self, query):
+        limit = self.config.items_per_page
+        page = int(query.get("page", ["1"])[0])
+        start = (page - 1) * limit
+        results = [
+            {"_id": f"bot{index}", "market_hash_name": self.catalogue[index], "price": self._price(index)}
+            for index in range(start, min(start + limit, len(self.catalogue)))
+        ]
+        return {"count": len(self.catalogue), "limit": limit, "results": results}
+
+    def _dash_p2p(self, query):
+        items = self.catalogue[:500]
+        return {"page": [
+            {"id": f"p2p{index}", "marketHashName": name, "priceBRL": self._price(index) * 0.97, "discount": self._discount(index)}
+            for index, name in enumerate(items)
+        ]}
+
+    def _brskins(self, query):
+        page = int(query.get("pageIndex", ["0"])[0])
+        start = page * 100
+        return {"offers": [
+            {"id": f"br{index}", "price": self._price(index) * 1.02, "discount": self._discount(index), "product": {"productCode": self.catalogue[index]}}
+            for index in range(start, min(start + 100, len(self.catalogue)))
+        ]}
+
+    def _buff(self, query):
+        goods_id = int(query.get("goods_id", ["0"])[0])
+        price_brl = self._price(goods_id - 1) * 1.15
+        return {"data": {"items": [{"price": f"{price_brl / CNY_BRL_RATE:.2f}"}], "total_count": 100 + goods_id % 200}}
+
+    def _exchange_rate(self):
+        return {"rates": {"BRL": CNY_BRL_RATE}}
+
+    def _id_dict(self):
+        return {"items": {name: {"buff163_goods_id": index + 1} for index, name in enumerate(self.catalogue)}}
+
+    # --- Rotas da API do scanner ---
+
+    def _scanner_api(self, endpoint, body):
+        if endpoint == "add-items":
+            items = body.get("items", [])
+            with self._lock:
+                self.scanned_names = [item["name"] for item in items]
+                self.received["scanned"] += len(items)
+            return {"status": "success", "created_items": len(items)}
+        if endpoint == "ingest-listings":
+            names = [item["name"] for item in body.get("items", [])]
+            with self._lock:
+                self.received["scanned"] += len(names)
+            return {"status": "success", "ingested_items": len(names), "items_to_update": names}
+        if endpoint == "items-to-update":
+            return {"items_to_update": list(self.scanned_names)}
+        if endpoint == "reference-prices":
+            return {"prices": {name: round(self._price(index) * 1.15, 2) for index, name in enumerate(self.catalogue)}}
+        if endpoint == "items-to-price":
+            return {"items_to_price": self.catalogue[:self.config.batch_size]}
+        if endpoint == "update-buff-prices":
+            count = len(body.get("items", []))
+            with self._lock:
+                self.received["buff_prices"] += count
+            return {"status": "success", "updated_items": count}
+        if endpoint == "calculate-differences":
+            return {"status": "success", "processed_items": len(self.scanned_names)}
+        if endpoint == "rate-budget":
+            return {"granted": body.get("tokens", 1), "retry_after": 0}
+        if endpoint == "get-item-batch":
+            with self._lock:
+                served = self.received["batches"]
+                self.received["batches"] += 1
+            if served >= self.config.worker_batches:
+                return {"items_to_price": [], "cny_brl_rate": str(CNY_BRL_RATE)}
+            start = served * self.config.batch_size
+            batch = [{"id": f"item-{index}", "buff_item_id": index + 1} for index in range(start, start + self.config.batch_size)]
+            return {"items_to_price": batch, "cny_brl_rate": str(CNY_BRL_RATE), "lease_id": "simulated-lease", "lease_seconds": 300}
+        if endpoint == "heartbeat-item-batch":
+            return {"extended_items": self.config.batch_size}
+        if endpoint == "submit-item-batch":
+            count = len(body.get("prices", []))
+            with self._lock:
+                self.received["item_prices"] += count
+            return {"status": "success", "updated_items": count}
+        return {"status": "success"}
+
+    def route(self, upstream_host, path, query, body):
+        """Retorna `(rota, payload)` para a requisição recebida."""
+        if "dashskins.com.br" in upstream_host:
+            return "dash_bot", self._dash_bot(query)
+        if "api.dashskins.gg" in upstream_host:
+            return "dash_p2p", self._dash_p2p(query)
+        if "brskins" in upstream_host:
+            return "brskins", self._brskins(query)
+        if "buff.163.com" in upstream_host:
+            return "buff", self._buff(query)
+        if "er-api.com" in upstream_host:
+            return "exchange_rate", self._exchange_rate()
+        if "githubusercontent.com" in upstream_host:
+            return "id_dict", self._id_dict()
+        if "/scanner/api/" in path:
+            endpoint = path.rstrip("/").rsplit("/", 1)[-1]
+            return f"api:{endpoint}", self._scanner_api(endpoint, body)
+        return None, None
+
+    def _handler_class(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, status, payload, negotiate=False, extra_headers=None):
+                if negotiate:
+                    # Rotas da API do scanner seguem a mesma negociação de formato do servidor real
+                    content_type, encoding = codecs.negotiate(self.headers.get("Accept"), self.headers.get("Accept-Encoding"))
+                    body, headers = codecs.encode(payload, content_type, encoding)
+                    headers["Accept-Encoding"] = ", ".join(codecs.available_encodings())
+                else:
+                    body, headers = json.dumps(payload).encode("utf-8"), {"Content-Type": "application/json"}
+                headers.update(extra_headers or {})
+                self.send_response(status)
+                for header, value in headers.items():
+                    self.send_header(header, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+                try:
+                    body = codecs.decode(raw_body, self.headers.get("Content-Type"), self.headers.get("Content-Encoding"))
+                except codecs.PayloadError:
+                    body = {}
+
+                config = simulator.config
+                delay = max(0.0, config.latency_ms + simulator._random.uniform(-config.jitter_ms, config.jitter_ms))
+                time.sleep(delay / 1000)
+
+                upstream_host = self.headers.get("X-Upstream-Host", "")
+                route, payload = simulator.route(upstream_host, parts.path, parse_qs(parts.query), body)
+                with simulator._lock:
+                    simulator.counts["requests"] += 1
+                    simulator.counts[route or "unknown"] += 1
+
+                is_api = route is not None and route.startswith("api:")
+                if route is None:
+                    return self._respond(404, {"error": "unknown route"})
+                if not is_api and simulator._chance(config.throttle_rate):
+                    with simulator._lock:
+                        simulator.counts["429"] += 1
+                    return self._respond(429, {"error": "Too Many Requests"})
+                if not is_api and simulator._chance(config.error_rate):
+                    with simulator._lock:
+                        simulator.counts["5xx"] += 1
+                    return self._respond(503, {"error": "Service Unavailable"})
+                if route == "id_dict" and self.headers.get("If-None-Match") == ID_DICT_ETAG:
+                    self.send_response(304)
+                    self.send_header("ETag", ID_DICT_ETAG)
+                    self.send_header("Content-Length", "0")
+                    return self.end_headers()
+                extra_headers = {"ETag": ID_DICT_ETAG} if route == "id_dict" else None
+                self._respond(200, simulator._fixtures.get(route, payload), negotiate=is_api, extra_headers=extra_headers)
+
+            def do_GET(self):
+                self._handle()
+
+            def do_POST(self):
+                self._handle()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
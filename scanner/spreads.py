@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .ingest import bulk_update_rows
+from .models import BlackList, LatestPrice, ScannedItem, MARKETPLACE_SOURCES
+
+# Só preços do Buff mais novos que isso entram na comparação
+BUFF_PRICE_MAX_AGE = timedelta(hours=3)
+# Abaixo deste diff (%), o preço do marketplace é considerado com o desconto de 7%
+DISCOUNT_THRESHOLD = -7
+
+
+def spreads(buff_cents, market_cents):
+    """
+    Diff (%) entre o Buff e o marketplace, truncado como `int()`, para arrays de preços em
+    centavos. A conta é feita em inteiros para dar exatamente o mesmo resultado que a
+    versão em Decimal (um float erraria o truncamento em casos como 7,00%).
+    """
+    diff = _truncated_div(100 * (buff_cents - market_cents), market_cents)
+    discounted = _truncated_div(100 * (100 * buff_cents - 93 * market_cents), 93 * market_cents)
+    return np.where(diff < DISCOUNT_THRESHOLD, discounted, diff)
+
+
+def _truncated_div(numerator, denominator):
+    # Divisão inteira arredondando em direção a zero (o `//` do NumPy arredonda para baixo)
+    return np.sign(numerator) * (np.abs(numerator) // denominator)
+
+
+def _cents(value):
+    return int(value * 100)
+
+
+def calculate_differences(names=None):
+    """
+    Recalcula o `diff` de todas as ofertas dos marketplaces contra o preço mais recente do
+    Buff (LatestPrice), em conjunto: uma consulta para as ofertas, uma para os preços, a conta
+    vetorizada e um update em lote por tabela só da coluna `diff` das linhas que mudaram
+    (sem tocar nos timestamps). Retorna `(itens comparados, linhas atualizadas)`.
+    """
+    market_rows = ScannedItem.objects.filter(source__in=MARKETPLACE_SOURCES)
+    if names is not None:
+        market_rows = market_rows.filter(name__in=names)
+    market_rows = market_rows.exclude(name__in=BlackList.objects.values('name'))
+
+    market = [row for row in market_rows.order_by().values_list('id', 'name', 'price', 'diff') if row[2] and row[2] > 0]
+    if not market:
+        return 0, 0
+
+    # Preço mais recente do Buff por nome
+    buff_rows = LatestPrice.objects.filter(
+        source='buff',
+        name__in=market_rows.values('name'),
+        timestamp__gte=timezone.now() - BUFF_PRICE_MAX_AGE,
+    ).values_list('id', 'name', 'price', 'diff')
+    latest_buff = {name: (buff_id, price, diff) for buff_id, name, price, diff in buff_rows}
+
+    matched = [row for row in market if row[1] in latest_buff and latest_buff[row[1]][1] and latest_buff[row[1]][1] > 0]
+    if not matched:
+        return 0, 0
+
+    buff_cents = np.array([_cents(latest_buff[name][1]) for _, name, _, _ in matched], dtype=np.int64)
+    market_cents = np.array([_cents(price) for _, _, price, _ in matched], dtype=np.int64)
+    diffs = spreads(buff_cents, market_cents).tolist()
+
+    changed = []
+    best_by_name = {}
+    for (row_id, name, _, old_diff), diff in zip(matched, diffs):
+        if old_diff != diff:
+            changed.append(ScannedItem(id=row_id, diff=diff))
+        best_by_name[name] = max(diff, best_by_name.get(name, diff))
+
+    # O preço atual do Buff guarda o melhor diff entre os marketplaces em que o item aparece
+    changed_buff = []
+    for name, diff in best_by_name.items():
+        buff_id, _, old_diff = latest_buff[name]
+        if old_diff != diff:
+            changed_buff.append(LatestPrice(id=buff_id, diff=diff))
+
+    return len(matched), bulk_update_rows(changed, ['diff']) + bulk_update_rows(changed_buff, ['diff'])
@@ -1,20 +1,36 @@
-import json
+import time
+import uuid
 from decimal import Decimal, InvalidOperation
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from datetime import timedelta
-from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta, timezone as dt_timezone
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST
 from django.conf import settings
 from django.db import transaction
 from django.db.models import Q
-from .models import ScannedItem, BlackList, SchedulerLogs, Item
+from .models import ScannedItem, ScanGeneration, BlackList, SchedulerLogs, Item, LatestPrice, MARKETPLACE_SOURCES
+from .ingest import ingest_snapshot, bulk_insert, bulk_update_rows, lock_marketplace_offers, record_latest_prices, ORM_BATCH_SIZE
+from . import spreads
+from .scheduling import (
+    LEASE_DURATION, acknowledge_lease, claim_items_for_pricing, extend_lease, grant_lease, has_items_to_price,
+    portfolio_items_to_price,
+)
 from trades.utils import _get_exchange_rate
-from scanner.services.utils import load_id_dict, clear_item_name
+from scanner.services.utils import clear_item_name
+from scanner.services import codecs, id_registry, rate_budget
+from scanner.services.codecs import PayloadError
 from django.core.paginator import Paginator
-from trades.models import Trade
+
+# Itens do Buff com menos ofertas que isso vão para a BlackList (pouca liquidez)
+BLACKLIST_MAX_OFFERS = 90
+
+# Intervalo entre as verificações de trabalho novo durante o long-poll de get-item-batch
+LONG_POLL_INTERVAL = 1.0
 
 # Decorator para autenticação da API
 def api_key_required(view_func):
@@ -26,6 +42,25 @@ def api_key_required(view_func):
         return view_func(request, *args, **kwargs)
     return _wrapped_view
 
+def _load_body(request):
+    """Lê o corpo da requisição da API: JSON ou msgpack, opcionalmente comprimido (gzip/zstd)."""
+    return codecs.decode(request.body, request.content_type, request.headers.get("Content-Encoding"))
+
+def _api_response(request, payload, status=200):
+    """
+    Resposta da API no formato pedido pelo cliente (Accept / Accept-Encoding).
+    O cabeçalho Accept-Encoding da resposta informa quais compressões o servidor
+    aceita nos corpos das próximas requisições.
+    """
+    content_type, encoding = codecs.negotiate(request.headers.get("Accept"), request.headers.get("Accept-Encoding"))
+    body, headers = codecs.encode(payload, content_type, encoding)
+    response = HttpResponse(body, status=status, content_type=headers.pop("Content-Type"))
+    for header, value in headers.items():
+        response[header] = value
+    response["Accept-Encoding"] = ", ".join(codecs.available_encodings())
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    return response
+
 @api_key_required
 @require_POST
 def log_scheduler_event(request):
@@ -34,15 +69,15 @@ def log_scheduler_event(request):
     """
     try:
         # Carrega os dados do corpo da requisição JSON
-        data = json.loads(request.body)
+        data = _load_body(request)
         message = data.get("message", "Empty message, try 'docker compose logs scheduler'")
 
         # Cria o log no banco de dados
         SchedulerLogs.objects.create(message=message)
         
-        return JsonResponse({"status": "success", "message": "Log created successfully"}, status=201)
+        return _api_response(request, {"status": "success", "message": "Log created successfully"}, status=201)
 
-    except json.JSONDecodeError:
+    except PayloadError:
         return JsonResponse({"error": "Invalid JSON payload"}, status=400)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
@@ -52,22 +87,12 @@ def log_scheduler_event(request):
 def get_items_to_price(request):
     """
     Endpoint que retorna uma lista de itens em portfólio (não vendidos)
-    que não têm um preço Buff recente.
+    que não têm um preço Buff recente, dos mais para os menos prioritários
+    (idade do preço, valor em carteira, nº de donos e volatilidade).
     """
-    # 1. Pega todos os nomes de itens únicos que estão em aberto no portfólio
-    open_portfolio_items = Trade.objects.filter(sell_price__isnull=True).values_list('item_name', flat=True).distinct()
+    items_needing_price = portfolio_items_to_price(limit=100)
 
-    # 2. Pega os nomes de itens que JÁ TÊM um preço Buff recente (últimas 5 horas)
-    recent_buff_items = ScannedItem.objects.filter(
-        source='buff',
-        name__in=open_portfolio_items,
-        timestamp__gte=timezone.now() - timedelta(hours=8) # 3 vezes por dia
-    ).values_list('name', flat=True)
-
-    # 3. Filtra a lista de itens do portfólio para encontrar aqueles que PRECISAM de um novo preço
-    items_needing_price = list(set(open_portfolio_items) - set(recent_buff_items))[:100]
-
-    return JsonResponse({"items_to_price": items_needing_price})
+    return _api_response(request, {"items_to_price": items_needing_price})
 
 
 @api_key_required
@@ -75,103 +100,222 @@ def get_items_to_price(request):
 def scanner_api_add_items(request):
     """
     Endpoint da API para receber e salvar os itens iniciais do scanner (Dash).
+
+    A varredura é aplicada como uma nova geração (delta contra a anterior, numa única
+    transação), então o scanner nunca fica vazio ou pela metade durante a ingestão.
     """
     try:
-        data = json.loads(request.body)
+        data = _load_body(request)
         items = data.get("items")
         if not isinstance(items, list):
             return JsonResponse({"error": "Invalid payload format"}, status=400)
 
-        ScannedItem.objects.filter(source__in=['dash_bot', 'dash_p2p', 'brskins']).delete()
-        items_to_create = [
-            ScannedItem(name=item['name'], price=item['price'], source=item['source'], link=item['link'])
-            for item in items
-        ]
-        ScannedItem.objects.bulk_create(items_to_create)
-        return JsonResponse({"status": "success", "created_items": len(items_to_create)}, status=201)
-    except json.JSONDecodeError:
+        generation = ingest_snapshot(items)
+        return _api_response(request, {
+            "status": "success",
+            "generation": generation.id,
+            "created_items": generation.inserted,
+            "updated_items": generation.updated,
+            "deleted_items": generation.deleted,
+        }, status=201)
+    except PayloadError:
         return JsonResponse({"error": "Invalid JSON"}, status=400)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 @api_key_required
-@require_http_methods(["GET"])
-def get_items_to_update(request):
+@require_POST
+def scanner_api_ingest_listings(request):
     """
-    Endpoint que retorna uma lista de itens que precisam ter o preço do Buff atualizado.
+    Endpoint incremental usado pelo poller de novos anúncios.
+
+    Diferente de `add-items`, não apaga a varredura atual: para cada item recebido,
+    substitui a oferta de marketplace existente apenas se a nova for mais barata
+    (ou se for o mesmo anúncio com preço atualizado). Retorna os nomes ingeridos que
+    precisam de um preço Buff recente.
     """
-    dash_items_to_check = ScannedItem.objects.filter(source__in=['dash_bot', 'dash_p2p', 'brskins'])
-    buff_items_in_db = ScannedItem.objects.filter(source='buff', timestamp__gte=timezone.now() - timedelta(hours=3))
+    try:
+        data = _load_body(request)
+        items = data.get("items")
+        if not isinstance(items, list):
+            return JsonResponse({"error": "Invalid payload format"}, status=400)
+
+        incoming = {item['name']: item for item in items}
+        # Leitura e escrita na mesma transação, sob o mesmo lock do add-items: nenhuma outra
+        # ingestão consegue inserir o mesmo item entre a leitura e o insert
+        with transaction.atomic():
+            lock_marketplace_offers()
+            generation = ScanGeneration.objects.first()
+            existing = {}
+            for scanned in ScannedItem.objects.select_for_update().filter(source__in=MARKETPLACE_SOURCES, name__in=list(incoming)):
+                existing.setdefault(scanned.name, []).append(scanned)
+
+            ids_to_delete = []
+            items_to_create = []
+            for name, item in incoming.items():
+                current = existing.get(name, [])
+                cheapest = min(current, key=lambda scanned: scanned.price, default=None)
+                if cheapest and cheapest.link != item['link'] and cheapest.price <= Decimal(str(item['price'])):
+                    continue
+                ids_to_delete.extend(scanned.id for scanned in current)
+                items_to_create.append(ScannedItem(name=name, price=item['price'], source=item['source'], link=item['link'], generation=generation))
+
+            ScannedItem.objects.filter(id__in=ids_to_delete).delete()
+            ScannedItem.objects.bulk_create(items_to_create)
+
+        ingested_names = [scanned.name for scanned in items_to_create]
+        return _api_response(request, {
+            "status": "success",
+            "ingested_items": len(items_to_create),
+            "items_to_update": _names_needing_buff_price(ingested_names),
+        }, status=201)
+    except PayloadError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+def _names_needing_buff_price(names=None):
+    """Nomes de itens de marketplace (fora da blacklist) sem preço Buff nas últimas 3 horas."""
+    dash_items_to_check = ScannedItem.objects.filter(source__in=MARKETPLACE_SOURCES)
+    if names is not None:
+        dash_items_to_check = dash_items_to_check.filter(name__in=names)
+    buff_items_in_db = LatestPrice.objects.filter(source='buff', timestamp__gte=timezone.now() - timedelta(hours=3))
     blacklist_items = BlackList.objects.all().values_list('name', flat=True)
 
     dash_items_to_check = dash_items_to_check.exclude(name__in=blacklist_items)
     recent_buff_names = buff_items_in_db.values_list('name', flat=True)
     items_needing_update = dash_items_to_check.exclude(name__in=recent_buff_names)
     
-    item_names = list(items_needing_update.values_list('name', flat=True))
-    
-    return JsonResponse({"items_to_update": item_names})
+    return list(items_needing_update.values_list('name', flat=True))
+
+@api_key_required
+@require_http_methods(["GET"])
+def get_items_to_update(request):
+    """
+    Endpoint que retorna uma lista de itens que precisam ter o preço do Buff atualizado.
+    """
+    return _api_response(request, {"items_to_update": _names_needing_buff_price()})
+
+@api_key_required
+@require_http_methods(["GET"])
+def get_reference_prices(request):
+    """
+    Endpoint que retorna o preço Buff mais recente (últimas 24 horas) de cada item,
+    usado pelo scanner como referência para parar cedo a paginação.
+    """
+    buff_prices_qs = LatestPrice.objects.filter(
+        source='buff',
+        timestamp__gte=timezone.now() - timedelta(hours=24)
+    ).values_list('name', 'price')
+
+    return _api_response(request, {"prices": {name: float(price) for name, price in buff_prices_qs}})
+
+@api_key_required
+@require_POST
+def acquire_rate_budget(request):
+    """
+    Endpoint para workers externos retirarem tokens do orçamento compartilhado do Buff.
+    Espera {"priority": "catalogue", "tokens": 5, "throttled": false}. Se "throttled" for
+    verdadeiro (o worker acabou de receber um 429), o balde é esvaziado antes.
+    """
+    try:
+        data = _load_body(request) or {}
+        priority = data.get("priority", rate_budget.CATALOGUE)
+        if priority not in rate_budget.PRIORITY_RESERVES:
+            return JsonResponse({"error": "Invalid priority"}, status=400)
+        tokens = min(max(int(data.get("tokens", 1)), 1), 50)
+
+        if data.get("throttled"):
+            rate_budget.drain()
+        granted, retry_after = rate_budget.try_acquire(priority, tokens)
+        return _api_response(request, {"granted": granted, "retry_after": round(retry_after, 3)})
+    except PayloadError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "Invalid payload format"}, status=400)
 
 @api_key_required
 @require_POST
 def update_buff_prices(request):
     """
     Endpoint para receber e salvar os preços do Buff para itens específicos.
+
+    O payload inteiro é validado antes de qualquer escrita. Depois, numa única transação,
+    os preços entram com um insert em lote no histórico e um upsert em LatestPrice, e os
+    itens com menos de BLACKLIST_MAX_OFFERS ofertas são gravados na BlackList com um único
+    upsert (ON CONFLICT no nome).
     """
     try:
-        data = json.loads(request.body)
+        data = _load_body(request)
         items = data.get("items")
         if not isinstance(items, list):
             return JsonResponse({"error": "Invalid payload format"}, status=400)
 
-        created_count = 0
-        for item in items:
-            ScannedItem.objects.create(
-                name=item['name'],
-                price=item['price'],
-                offers=item['offers'],
-                link=item['link'],
-                source='buff'
+        buff_items = []
+        blacklist = {}
+        for index, item in enumerate(items):
+            buff_item = _parse_buff_item(item)
+            if buff_item is None:
+                return JsonResponse({"error": f"Invalid item at index {index}"}, status=400)
+            buff_items.append(buff_item)
+            if buff_item.offers < BLACKLIST_MAX_OFFERS:
+                # Um nome repetido no payload fica com a última contagem de ofertas
+                blacklist[buff_item.name] = BlackList(name=buff_item.name, offers=buff_item.offers)
+
+        with transaction.atomic():
+            created_count = bulk_insert(buff_items)
+            record_latest_prices(buff_items)
+            BlackList.objects.bulk_create(
+                list(blacklist.values()),
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['offers', 'timestamp'],
+                batch_size=ORM_BATCH_SIZE,
             )
-            created_count += 1
-            if item.get('offers', 0) < 90:
-                BlackList.objects.update_or_create(
-                    name=item['name'],
-                    defaults={'offers': item['offers']}
-                )
-        return JsonResponse({"status": "success", "updated_items": created_count}, status=201)
+        return _api_response(request, {
+            "status": "success",
+            "updated_items": created_count,
+            "blacklisted_items": len(blacklist),
+        }, status=201)
+    except PayloadError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+
+def _parse_buff_item(item):
+    """Valida um item de update-buff-prices e o converte em ScannedItem. Retorna None se for inválido."""
+    if not isinstance(item, dict) or not isinstance(item.get("name"), str) or not item["name"]:
+        return None
+    offers, link = item.get("offers"), item.get("link")
+    if isinstance(offers, bool) or not isinstance(offers, int) or offers < 0:
+        return None
+    if link is not None and not isinstance(link, str):
+        return None
+    try:
+        price = Decimal(str(item.get("price"))).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+    if not price.is_finite() or not Decimal(0) <= price < Decimal("1e8"): # max_digits=10, decimal_places=2
+        return None
+    return ScannedItem(name=item["name"], price=price, offers=offers, link=link, source='buff')
+
 @api_key_required
 @require_POST
 def calculate_differences(request):
     """
     Endpoint para acionar o cálculo da diferença de preços entre Dash e Buff.
+    Aceita opcionalmente {"names": [...]} para recalcular apenas esses itens.
+    O cálculo é feito em conjunto (ver spreads.calculate_differences).
     """
-    dash_items_to_compare = ScannedItem.objects.filter(source__in=['dash_bot', 'dash_p2p', 'brskins'])
-
-    dash_items_to_compare = dash_items_to_compare.exclude(name__in=BlackList.objects.all().values_list('name', flat=True))
+    try:
+        data = _load_body(request) or {}
+    except PayloadError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
 
-    items_processed = 0
-    for dash_item in dash_items_to_compare:
-        try:
-            buff_item = ScannedItem.objects.filter(source='buff', name=dash_item.name, timestamp__gte=timezone.now() - timedelta(hours=3)).first()
-            if buff_item and buff_item.price and dash_item.price and buff_item.price > 0 and dash_item.price > 0:
-                buff_price = Decimal(buff_item.price)
-                dash_price = Decimal(dash_item.price)
-                diff = int((buff_price / dash_price - 1) * 100)
-                if diff < -7:
-                    diff = int((buff_price / (dash_price * Decimal('0.93')) - 1) * 100)
-                
-                dash_item.diff = diff
-                buff_item.diff = diff
-                dash_item.save()
-                buff_item.save()
-                items_processed += 1
-        except Exception as e:
-            continue
-    return JsonResponse({"status": "success", "processed_items": items_processed})
+    names = data.get("names") if isinstance(data, dict) and isinstance(data.get("names"), list) else None
+    items_processed, items_updated = spreads.calculate_differences(names)
+    return _api_response(request, {"status": "success", "processed_items": items_processed, "updated_items": items_updated})
 
 @login_required
 def scanner_view(request):
@@ -180,16 +324,16 @@ def scanner_view(request):
     além de calcular estatísticas do scanner.
     """
     dash_items = ScannedItem.objects.filter(
-        source__in=['dash_bot', 'dash_p2p', 'brskins']
+        source__in=MARKETPLACE_SOURCES
     ).exclude(diff__isnull=True).order_by('-diff')
     
     item_names = dash_items.values_list('name', flat=True)
     
     # Busca apenas o preço mais recente de cada item no Buff
-    buff_prices_qs = ScannedItem.objects.filter(
+    buff_prices_qs = LatestPrice.objects.filter(
         source='buff', 
         name__in=item_names
-    ).order_by('name', '-timestamp').distinct('name')
+    )
     
     buff_data_map = {item.name: {'price': item.price, 'offers': item.offers, 'link': item.link} for item in buff_prices_qs}
     
@@ -221,8 +365,8 @@ def scanner_view(request):
             'buff_link': buff_data_map.get(item.name, {}).get('link')
         })
 
-    last_check = ScannedItem.objects.filter(source__in=['dash_bot', 'dash_p2p', 'brskins']).order_by('-timestamp').first()
-    last_check_time = last_check.timestamp if last_check else None
+    last_generation = ScanGeneration.objects.first()
+    last_check_time = last_generation.created_at if last_generation else None
     next_run_in = None
     if last_check_time:
         next_run_time = last_check_time + timedelta(hours=1)
@@ -239,14 +383,24 @@ def scanner_view(request):
 
 @api_key_required
 @require_http_methods(["GET"])
-@transaction.atomic
 def get_items_for_pricing(request):
     """
     Endpoint da API para trabalhadores (workers) obterem um lote de itens para precificar.
 
-    Busca 50 itens que (1) não têm preço (price=null) E (2) não estão "bloqueados" (price_time=null)
-    OU (3) o bloqueio expirou (ex: worker falhou).
+    Os itens são entregues sob um lease (`lease_id`, válido até `lease_expires_at`): o worker
+    o estende em heartbeat-item-batch e o confirma em submit-item-batch. Se o worker cair,
+    o lease expira em minutos e os itens voltam para a fila.
+
+    Com `?wait=<segundos>` (long-poll, até SCANNER_LONG_POLL_MAX), se não houver trabalho a
+    requisição fica aberta até surgir algum item ou o prazo acabar. A espera acontece fora
+    de qualquer transação, consultando a cada LONG_POLL_INTERVAL se há itens elegíveis.
     """
+    try:
+        wait = min(max(float(request.GET.get("wait", 0)), 0), settings.SCANNER_LONG_POLL_MAX)
+    except ValueError:
+        return JsonResponse({"error": "Parâmetro wait inválido."}, status=400)
+    deadline = time.monotonic() + wait
+
     try:
         # 1. Carrega dependências (taxa de câmbio e dicionário de IDs)
         cny_brl_rate = _get_exchange_rate("CNY")
@@ -254,67 +408,116 @@ def get_items_for_pricing(request):
             return JsonResponse({"error": "Não foi possível obter a taxa de câmbio CNY/BRL."}, status=500)
         
         try:
-            id_dict = load_id_dict()
+            id_dict = id_registry.buff_ids()
         except Exception as e:
             return JsonResponse({"error": f"Não foi possível carregar o dicionário de IDs: {e}"}, status=500)
+        # Sem dicionário, todo item pareceria "sem ID" e seria zerado em _claim_pricing_batch
+        if not id_dict:
+            return JsonResponse({"error": "O dicionário de IDs do Buff está vazio."}, status=500)
 
-        # Define um timeout para itens que provavelmente "ficaram presos"/falharam
-        timeout_period = timezone.now() - timedelta(hours=6)
-
-        # # 2. Busca 50 itens que:
-        # #    - Ainda não têm preço (price__isnull=True)
-        # #    - E (OU estão "novos" (price_time__isnull=True)
-        # #    - OU o "bloqueio" expirou (price_time__lte=timeout_period))
-        # items_to_process = Item.objects.filter(
-        #     price__isnull=True
-        # ).filter(
-        #     Q(price_time__isnull=True) | Q(price_time__lte=timeout_period)
-        # ).select_for_update(skip_locked=True)[:50]
-
-        # 2. Busca 100 itens que:
-        #    - Foram precificados há mais de 6 horas (price_time__lte=...)
-        items_to_process = Item.objects.filter(
-            Q(price_time__isnull=True) | Q(price_time__lte=timeout_period)
-        ).select_for_update(skip_locked=True)[:100]
-
-        if not items_to_process:
-            return JsonResponse({"items_to_price": [], "cny_brl_rate": cny_brl_rate})
-
-        # 3. Prepara a lista de trabalho, encontrando o ID do Buff para cada item
-        work_batch = []
-        item_ids_to_lock = []
-        
-        for item in items_to_process:
-            cleared_name = clear_item_name(item.market_hash_name)
-            buff_item_id = id_dict.get(cleared_name)
-            
-            if buff_item_id:
-                work_batch.append({
-                    "id": item.id,
-                    "buff_item_id": buff_item_id
-                })
-                item_ids_to_lock.append(item.id)
-            else:
-                # Se não encontrar o ID, marca como "precificado" com 0 para não buscar de novo
-                item.price = Decimal("0.00")
-                item.offers = 0
-                item.price_time = timezone.now()
-                item.save() # Salva individualmente (raro)
-
-        # 4. "Bloqueia" os itens que foram enviados para o worker
-        if item_ids_to_lock:
-            Item.objects.filter(id__in=item_ids_to_lock).update(price_time=timezone.now())
-
-        # 5. Retorna a lista de trabalho e a taxa de câmbio
-        return JsonResponse({
-            "items_to_price": work_batch,
-            "cny_brl_rate": cny_brl_rate
-        })
+        while True:
+            payload = _claim_pricing_batch(id_dict, cny_brl_rate)
+            if payload["items_to_price"] or not _wait_for_pricing_work(deadline):
+                return _api_response(request, payload)
 
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 
+def _wait_for_pricing_work(deadline):
+    """Espera (sem transação aberta) até haver itens para precificar. Retorna False se o prazo acabou."""
+    while (remaining := deadline - time.monotonic()) > 0:
+        time.sleep(min(LONG_POLL_INTERVAL, remaining))
+        if has_items_to_price():
+            return True
+    return False
+
+
+@transaction.atomic
+def _claim_pricing_batch(id_dict, cny_brl_rate):
+    """Passos 2 a 5 de get_items_for_pricing, numa transação curta."""
+    # # 2. Busca 50 itens que:
+    # #    - Ainda não têm preço (price__isnull=True)
+    # #    - E (OU estão "novos" (price_time__isnull=True)
+    # #    - OU o "bloqueio" expirou (price_time__lte=timeout_period))
+    # items_to_process = Item.objects.filter(
+    #     price__isnull=True
+    # ).filter(
+    #     Q(price_time__isnull=True) | Q(price_time__lte=timeout_period)
+    # ).select_for_update(skip_locked=True)[:50]
+
+    # 2. Busca os 100 itens de maior prioridade (ver rescore_pricing) que:
+    #    - Foram precificados há mais de 6 horas (ou nunca foram)
+    #    - E não estão com outro worker (sem lease ativo)
+    items_to_process = claim_items_for_pricing(limit=100)
+
+    # 3. Prepara a lista de trabalho, encontrando o ID do Buff para cada item
+    work_batch = []
+    item_ids_to_lease = []
+    
+    for item in items_to_process:
+        cleared_name = clear_item_name(item.market_hash_name)
+        buff_item_id = id_dict.get(cleared_name)
+        
+        if buff_item_id:
+            work_batch.append({
+                "id": item.id,
+                "buff_item_id": buff_item_id
+            })
+            item_ids_to_lease.append(item.id)
+        else:
+            # Se não encontrar o ID, marca como "precificado" com 0 para não buscar de novo
+            item.price = Decimal("0.00")
+            item.offers = 0
+            item.price_time = timezone.now()
+            item.priority = 0
+            item.save() # Salva individualmente (raro)
+
+    if not item_ids_to_lease:
+        return {"items_to_price": [], "cny_brl_rate": cny_brl_rate}
+
+    # 4. Entrega os itens ao worker sob um lease
+    lease_id, leased_until = grant_lease(item_ids_to_lease)
+
+    # 5. Retorna a lista de trabalho, o lease e a taxa de câmbio
+    return {
+        "items_to_price": work_batch,
+        "cny_brl_rate": cny_brl_rate,
+        "lease_id": str(lease_id),
+        "lease_expires_at": leased_until,
+        "lease_seconds": int(LEASE_DURATION.total_seconds()),
+    }
+
+
+@api_key_required
+@require_POST
+def heartbeat_item_batch(request):
+    """
+    Endpoint para o worker estender o lease de um lote enquanto ainda o está precificando.
+    Espera {"lease_id": "..."}; "extended_items" = 0 indica que o lease foi perdido.
+    """
+    try:
+        data = _load_body(request) or {}
+        lease_id = uuid.UUID(str(data["lease_id"]))
+    except PayloadError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "lease_id inválido."}, status=400)
+
+    extended, leased_until = extend_lease(lease_id)
+    return _api_response(request, {"extended_items": extended, "lease_expires_at": leased_until})
+
+
+def _parse_priced_at(value, now):
+    """`priced_at` enviado pelo worker (ISO 8601); sem ele, ou no futuro, vale o horário do servidor."""
+    priced_at = parse_datetime(value) if isinstance(value, str) else None
+    if priced_at is None:
+        return now
+    if timezone.is_naive(priced_at):
+        priced_at = timezone.make_aware(priced_at, dt_timezone.utc)
+    return min(priced_at, now)
+
+
 @api_key_required
 @require_POST
 def submit_item_prices(request):
@@ -323,19 +526,31 @@ def submit_item_prices(request):
     Espera um JSON no formato:
     {
         "prices": [
-            {"id": "skin-123", "price_cny": 10.50, "offers": 120},
-            {"id": "skin-456", "price_cny": 120.00, "offers": 50}
+            {"id": "skin-123", "price_cny": 10.50, "offers": 120, "priced_at": "2025-01-01T12:00:00+00:00"},
+            {"id": "skin-456", "price_cny": 120.00, "offers": 50, "priced_at": "2025-01-01T12:00:03+00:00"}
         ],
-        "cny_brl_rate": "1.45" 
+        "cny_brl_rate": "1.45",
+        "lease_id": "..."
     }
+    O envio confirma o lease: não são aceitos preços de itens que foram reentregues a outro
+    worker, e os itens do lease que não vieram no envio voltam para a fila.
+
+    É idempotente: `priced_at` (momento em que o preço foi lido no Buff) vira o `price_time`
+    do item, e um preço só é gravado se for mais novo que o atual. Reenvios do diário do
+    worker (ver services/journal.py) não têm efeito se o lote já tinha sido recebido.
     """
     try:
-        data = json.loads(request.body)
+        data = _load_body(request)
         prices_data = data.get("prices")
         cny_brl_rate_str = data.get("cny_brl_rate")
 
         if not isinstance(prices_data, list) or not cny_brl_rate_str:
             return JsonResponse({"error": "Formato de payload inválido."}, status=400)
+
+        try:
+            lease_id = uuid.UUID(str(data["lease_id"])) if data.get("lease_id") else None
+        except ValueError:
+            return JsonResponse({"error": "lease_id inválido."}, status=400)
         
         rate = Decimal(cny_brl_rate_str)
         items_to_update = []
@@ -355,19 +570,40 @@ def submit_item_prices(request):
                         id=item_id, 
                         price=price_brl, 
                         offers=int(offers),
-                        price_time=now
+                        price_time=_parse_priced_at(item_info.get("priced_at"), now),
+                        priority=0 # Volta a subir no próximo rescore, conforme o preço envelhece
                     )
                     items_to_update.append(item)
                 except (ValueError, TypeError, InvalidOperation):
                     continue # Pula dados inválidos
 
-        # 2. Atualiza todos os itens de uma só vez
-        if items_to_update:
-            Item.objects.bulk_update(items_to_update, ['price', 'offers', 'price_time'])
+        with transaction.atomic():
+            # 2. Confirma o lease e descarta preços de itens que já não são deste worker
+            accepted_ids = acknowledge_lease(lease_id, [item.id for item in items_to_update])
+            rejected_count = len(items_to_update) - len(accepted_ids)
+            items_to_update = [item for item in items_to_update if item.id in accepted_ids]
 
-        return JsonResponse({"status": "success", "updated_items": len(items_to_update)}, status=200)
-
-    except json.JSONDecodeError:
+            # 3. Descarta preços repetidos ou mais antigos que o já gravado
+            current_times = dict(
+                Item.objects.select_for_update().filter(id__in=accepted_ids).values_list('id', 'price_time')
+            )
+            fresh_items = [
+                item for item in items_to_update
+                if current_times.get(item.id) is None or current_times[item.id] < item.price_time
+            ]
+            duplicate_count = len(items_to_update) - len(fresh_items)
+
+            # 4. Atualiza todos os itens de uma só vez (COPY + UPDATE ... FROM no PostgreSQL)
+            updated_count = bulk_update_rows(fresh_items, ['price', 'offers', 'price_time', 'priority'])
+
+        return _api_response(request, {
+            "status": "success",
+            "updated_items": updated_count,
+            "rejected_items": rejected_count,
+            "duplicate_items": duplicate_count,
+        }, status=200)
+
+    except PayloadError:
         return JsonResponse({"error": "Invalid JSON"}, status=400)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
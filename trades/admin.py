@@ -10,7 +10,7 @@ from __future__ import annotations
 
 from django.contrib import admin
 
-from .models import Trade, Investment, Profile
+from .models import Trade, Investment, Profile, ExchangeRate
 
 
 @admin.register(Trade)
@@ -44,4 +44,10 @@ class ProfileAdmin(admin.ModelAdmin):
     """Admin view for Profiles."""
     list_display = ('user', 'is_public')
     list_filter = ('is_public',)
-    search_fields = ('user__username',)
\ No newline at end of file
+    search_fields = ('user__username',)
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    """Admin view for Exchange Rates."""
+    list_display = ('currency', 'rate', 'fetched_at')
+    list_filter = ('currency',)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from trades.utils import FX_CURRENCIES, refresh_exchange_rate
+
+
+class Command(BaseCommand):
+    help = 'Busca as cotações das moedas estrangeiras em BRL e grava no histórico.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('currencies', nargs='*', default=list(FX_CURRENCIES), help='Moedas a atualizar (padrão: todas).')
+
+    def handle(self, *args, **options):
+        for currency in options['currencies']:
+            rate = refresh_exchange_rate(currency.upper())
+            if rate is None:
+                self.stdout.write(self.style.ERROR(f"-> {currency.upper()}: não foi possível obter a cotação."))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"-> {currency.upper()}/BRL = {rate}"))
@@ -118,4 +118,18 @@ class Investment(models.Model):
         ordering = ["-date"]
 
     def __str__(self):
-        return f"{self.amount} on {self.date}"
\ No newline at end of file
+        return f"{self.amount} on {self.date}"
+
+
+class ExchangeRate(models.Model):
+    """Cotação de uma moeda em BRL, com o momento em que foi obtida (histórico)."""
+    currency = models.CharField(max_length=3)
+    rate = models.DecimalField(max_digits=12, decimal_places=4)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-fetched_at"]
+        indexes = [models.Index(fields=["currency", "-fetched_at"])]
+
+    def __str__(self):
+        return f"{self.currency}/BRL {self.rate} at {self.fetched_at}"
@@ -1,18 +1,104 @@
+import threading
+from datetime import timedelta
 from decimal import Decimal
+
 import requests
 from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
 
-def _get_exchange_rate(currency: str) -> Decimal | None:
-    '''Obtém a taxa de câmbio atual para a moeda especificada em relação ao BRL (moeda exibida).'''
-    rate = cache.get(currency)
-    if rate:
-        return rate
+from scanner.services import http_client
+from .models import ExchangeRate
+
+# Moedas mantidas atualizadas pelo `refresh_exchange_rates`
+FX_CURRENCIES = ("CNY", "USD")
+# Depois disso a cotação ainda é servida, mas é revalidada em segundo plano
+FX_MAX_AGE = timedelta(hours=2)
+# Quanto tempo cada processo guarda a última cotação antes de reler do banco
+FX_CACHE_TIMEOUT = 60 * 5
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _fetch_exchange_rate(currency: str) -> Decimal:
+    response = http_client.get(f"https://open.er-api.com/v6/latest/{currency}", timeout=(3, 10))
+    response.raise_for_status()
+    return Decimal(str(response.json()["rates"]["BRL"])).quantize(Decimal("0.0001"))
+
+
+def refresh_exchange_rate(currency: str) -> Decimal | None:
+    '''
+    Busca a cotação no provedor, grava no histórico e atualiza o cache. Retorna None em caso de erro.
+
+    Com o upstream simulado ativo (benchmark_scanner) a cotação vai só para o cache do processo.
+    '''
     try:
-        response = requests.get(f"https://open.er-api.com/v6/latest/{currency}")
-        response.raise_for_status()
-        data = response.json()
-        rate = Decimal(data["rates"]["BRL"]).quantize(Decimal("0.0001"))
-        cache.set(currency, rate)
+        rate = _fetch_exchange_rate(currency)
+    except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+        print(f"An error occurred while refreshing the {currency} exchange rate: {e}")
+        return None
+    if http_client.upstream_override_active():
+        cache.set(f"fx:{currency}", (rate, timezone.now()), FX_CACHE_TIMEOUT)
         return rate
-    except (requests.RequestException, KeyError, TypeError):
-        return None
\ No newline at end of file
+    entry = ExchangeRate.objects.create(currency=currency, rate=rate)
+    cache.set(f"fx:{currency}", (entry.rate, entry.fetched_at), FX_CACHE_TIMEOUT)
+    return rate
+
+
+def _refresh_in_background(currency: str):
+    with _refreshing_lock:
+        if currency in _refreshing:
+            return
+        _refreshing.add(currency)
+
+    def run():
+        try:
+            refresh_exchange_rate(currency)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(currency)
+            connection.close()
+
+    threading.Thread(target=run, name=f"fx-refresh-{currency}", daemon=True).start()
+
+
+def _latest_exchange_rate(currency: str):
+    latest = cache.get(f"fx:{currency}")
+    if latest is None:
+        entry = ExchangeRate.objects.filter(currency=currency).first()
+        if entry is None:
+            return None
+        latest = (entry.rate, entry.fetched_at)
+        cache.set(f"fx:{currency}", latest, FX_CACHE_TIMEOUT)
+    return latest
+
+
+def _get_exchange_rate(currency: str, wait: bool = False) -> Decimal | None:
+    '''
+    Obtém a taxa de câmbio atual para a moeda especificada em relação ao BRL (moeda exibida).
+
+    Serve imediatamente a última cotação conhecida; se ela passou de FX_MAX_AGE, é
+    revalidada em segundo plano (stale-while-revalidate). Só quando não existe nenhuma
+    cotação gravada e `wait=True` a chamada espera pelo provedor.
+    '''
+    latest = _latest_exchange_rate(currency)
+    if latest is None:
+        if wait:
+            return refresh_exchange_rate(currency)
+        _refresh_in_background(currency)
+        return None
+
+    rate, fetched_at = latest
+    if timezone.now() - fetched_at > FX_MAX_AGE:
+        _refresh_in_background(currency)
+    return rate
+
+
+def _get_exchange_rate_as_of(currency: str, moment) -> Decimal | None:
+    '''Cotação vigente em `moment` (a última obtida até lá), para converter operações passadas.'''
+    if moment is None or timezone.now() - moment < FX_MAX_AGE:
+        return _get_exchange_rate(currency)
+    history = ExchangeRate.objects.filter(currency=currency)
+    entry = history.filter(fetched_at__lte=moment).first() or history.order_by("fetched_at").first()
+    return entry.rate if entry else _get_exchange_rate(currency)
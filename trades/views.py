@@ -21,27 +21,41 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
 
+from django.db import transaction
 from django.db.models import F, Sum, Value, Q, DecimalField
 from django.db.models.functions import Coalesce
 from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.utils import timezone
 from django.utils.timezone import make_aware
+from django.utils.dateparse import parse_datetime
 from django.conf import settings
 
-from .utils import _get_exchange_rate
+from .utils import _get_exchange_rate_as_of
 from .forms import SellTradeForm, EditTradeForm, InvestmentForm, AddTradeForm, UsernameChangeForm
 from .models import Trade, Investment, SOURCE_CHOICES
-from scanner.models import ScannedItem
+from scanner.models import ScannedItem, LatestPrice
+from scanner.ingest import record_latest_prices
+from scanner.rollups import price_series
 from subscriptions.models import Subscription
 from scanner.services import buff
 
-def _convert_currency_to_brl(amount_str: str, currency: str) -> Decimal | None:
-    """Converte um valor de uma moeda estrangeira para BRL."""
+def _parse_form_datetime(value: str | None) -> datetime | None:
+    """Converte o valor de um campo datetime-local do POST em datetime com fuso."""
+    try:
+        parsed = parse_datetime(value) if value else None
+    except ValueError:
+        return None
+    if parsed and timezone.is_naive(parsed):
+        parsed = make_aware(parsed)
+    return parsed
+
+def _convert_currency_to_brl(amount_str: str, currency: str, moment: datetime | None = None) -> Decimal | None:
+    """Converte um valor de uma moeda estrangeira para BRL, com a cotação vigente em `moment`."""
     if currency not in ["CNY", "USD"]:
         return Decimal(amount_str)
     
-    rate = _get_exchange_rate(currency)
+    rate = _get_exchange_rate_as_of(currency, moment)
     if rate is None:
         return None
         
@@ -89,10 +103,10 @@ def _calculate_portfolio_metrics(user: User, show_history: bool = False) -> dict
     # Otimização para buscar preços de mercado
     open_item_names = open_qs.values_list('item_name', flat=True).distinct()
     
-    buff_prices_qs = ScannedItem.objects.filter(
+    buff_prices_qs = LatestPrice.objects.filter(
         name__in=open_item_names,
         source='buff'
-    ).order_by('name', '-timestamp').distinct('name')
+    )
     
     market_prices = {item.name: item.price for item in buff_prices_qs}
 
@@ -369,7 +383,7 @@ def index(request: HttpRequest) -> HttpResponse:
                 quantity = data.pop('quantity')
                 currency = data.pop('buy_price_currency')
                 
-                converted_price = _convert_currency_to_brl(data['buy_price'], currency)
+                converted_price = _convert_currency_to_brl(data['buy_price'], currency, data.get('buy_date'))
                 if converted_price is None:
                     add_form.add_error(None, f"Não foi possível converter a taxa de {currency} para BRL.")
                 else:
@@ -380,7 +394,7 @@ def index(request: HttpRequest) -> HttpResponse:
 
                     # Verifica se existe um preço recente no buff
                     if item_name:
-                        has_recent_price = ScannedItem.objects.filter(
+                        has_recent_price = LatestPrice.objects.filter(
                             name=item_name,
                             source='buff',
                             timestamp__gte=timezone.now() - timedelta(hours=8)
@@ -389,13 +403,15 @@ def index(request: HttpRequest) -> HttpResponse:
                         if not has_recent_price:
                             buff_info = buff.get_item_info(item_name)
                             if buff_info and buff_info.get('price'):
-                                ScannedItem.objects.create(
-                                    name=item_name,
-                                    price=buff_info['price'],
-                                    offers=buff_info.get('offers'),
-                                    link=buff_info.get('link'),
-                                    source='buff'
-                                )
+                                with transaction.atomic():
+                                    scanned = ScannedItem.objects.create(
+                                        name=item_name,
+                                        price=buff_info['price'],
+                                        offers=buff_info.get('offers'),
+                                        link=buff_info.get('link'),
+                                        source='buff'
+                                    )
+                                    record_latest_prices([scanned])
                     return redirect("index")
         elif action == "sell": #UPDATE
             trade_id = request.POST.get("trade_id")
@@ -405,7 +421,7 @@ def index(request: HttpRequest) -> HttpResponse:
             price = request.POST.get("sell_price")
             currency = request.POST.get("sell_price_currency")
 
-            converted_price = _convert_currency_to_brl(price, currency)
+            converted_price = _convert_currency_to_brl(price, currency, _parse_form_datetime(request.POST.get("sell_date")))
             if converted_price is None:
                 form.add_error(None, f"Não foi possível converter a taxa de {currency} para BRL.")
             else:
@@ -426,7 +442,7 @@ def index(request: HttpRequest) -> HttpResponse:
             buy_price = post_data.get("buy_price")
             buy_currency = post_data.get("buy_price_currency")
             if buy_price and buy_currency and buy_currency != 'BRL':
-                converted_buy_price = _convert_currency_to_brl(buy_price, buy_currency)
+                converted_buy_price = _convert_currency_to_brl(buy_price, buy_currency, _parse_form_datetime(post_data.get("buy_date")))
                 if converted_buy_price is not None:
                     post_data['buy_price'] = converted_buy_price
                 else:
@@ -436,7 +452,7 @@ def index(request: HttpRequest) -> HttpResponse:
             sell_price = post_data.get("sell_price")
             sell_currency = post_data.get("sell_price_currency")
             if sell_price and sell_currency and sell_currency != 'BRL':
-                converted_sell_price = _convert_currency_to_brl(sell_price, sell_currency)
+                converted_sell_price = _convert_currency_to_brl(sell_price, sell_currency, _parse_form_datetime(post_data.get("sell_date")))
                 if converted_sell_price is not None:
                     post_data['sell_price'] = converted_sell_price
                 else:
@@ -545,11 +561,8 @@ def price_history(request, trade_id):
     if trade.buy_price == 0:
         return JsonResponse({'error': 'Buy price cannot be zero.'}, status=400)
 
-    scanned_prices = ScannedItem.objects.filter(
-        name=trade.item_name,
-        source="buff",
-        timestamp__range=[start_datetime - timedelta(hours=2), end_datetime]
-    ).order_by('timestamp').values('timestamp', 'price')
+    # Lê do histórico bruto ou dos agregados por hora/dia, conforme o intervalo do trade
+    scanned_prices = price_series(trade.item_name, start_datetime - timedelta(hours=2), end_datetime)
 
     profit_data = []
     buy_price = float(trade.buy_price)
@@ -561,11 +574,11 @@ def price_history(request, trade_id):
     # })
 
     # Calculate profit percentage for each intermediate scanned price.
-    for item in scanned_prices:
-        price = float(item['price'])
+    for timestamp, price in scanned_prices:
+        price = float(price)
         profit = ((price / buy_price) - 1) * 100
         profit_data.append({
-            'x': item['timestamp'].isoformat(),
+            'x': timestamp.isoformat(),
             'y': profit,
             'price': price
         })